@@ -1,5 +1,3 @@
-from pydoc import locate
-
 __all__ = [
     "CmdFlag",
     "CmdDefault",
@@ -7,6 +5,14 @@ __all__ = [
 ]
 
 class CmdArg():
+    # type names that can be accepted by arguments, mapped to their types
+    ACCEPTED_TYPES = {
+        "str" : str,
+        "int" : int,
+        "float" : float,
+        "bool" : bool
+    }
+
     def _try_cast(self, value, typename):
         """Attempt to cast a value to the given typename, returns the converted
         value on success
@@ -19,7 +25,7 @@ class CmdArg():
             any or None: returns converted value on success, None on failure
         """
 
-        translator = locate(typename)
+        translator = self.ACCEPTED_TYPES.get(typename)
 
         try:
             converted = translator(value)
@@ -0,0 +1,98 @@
+import sqlite3
+import threading
+import time
+import zlib
+
+__all__ = [
+    "CorpusStore"
+]
+
+class CorpusStore:
+    """On disk store of the text elements extracted from crawled pages, so
+    wordlists can be generated again with different settings without crawling
+    the site again. Elements are kept per url in a SQLite database, compressed
+    as one block per page. Writes are thread safe.
+
+    Attributes:
+        location (str): path of the database file, created if it does not
+            exist
+        commit_every (int): (default=100) number of pages to add before
+            committing them to disk
+    """
+
+    # separates elements within a page block, never appears in page text
+    SEPARATOR = "\x00"
+
+    def __init__(self, location, commit_every=100):
+        self.location = location
+        self.commit_every = commit_every
+
+        self._connection = sqlite3.connect(location, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+
+        with self._lock:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, "
+                "stored_at REAL NOT NULL, "
+                "elements BLOB NOT NULL)"
+            )
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def _encode(self, elements):
+        text = self.SEPARATOR.join(element.replace(self.SEPARATOR, "") for element in elements)
+        return zlib.compress(text.encode("utf-8"))
+
+    def _decode(self, block):
+        text = zlib.decompress(block).decode("utf-8")
+        if text == "":
+            return []
+        return text.split(self.SEPARATOR)
+
+    def add_page(self, url, elements):
+        """Store the text elements of a page, replacing any stored for the
+        same url
+
+        Parameters:
+            url (str): url of the page
+            elements (list(str)): text elements of the page
+        """
+        block = self._encode(elements)
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages (url, stored_at, elements) VALUES (?, ?, ?)",
+                (url, time.time(), block)
+            )
+
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self._connection.commit()
+                self._uncommitted = 0
+
+    def iter_pages(self):
+        """Read back every stored page in the order it was stored, pages are
+        read from disk as they are needed
+
+        Returns:
+            generator (tuple(str, list(str))): url and text elements of each
+                page
+        """
+        with self._lock:
+            self._connection.commit()
+            self._uncommitted = 0
+
+        cursor = self._connection.execute("SELECT url, elements FROM pages ORDER BY rowid")
+        for url, block in cursor:
+            yield url, self._decode(block)
+
+    def close(self):
+        """Commit any stored pages and close the database"""
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
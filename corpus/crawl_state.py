@@ -0,0 +1,153 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from collections import namedtuple
+
+from output.delta_output import CandidateFingerprints
+
+__all__ = [
+    "PageState",
+    "CrawlState"
+]
+
+# what is remembered about a page between crawls
+#   etag (str): etag validator of the page response, None if not given
+#   last_modified (str): last-modified validator of the page response, None if
+#       not given
+#   content_hash (str): hash of the page body
+#   links (list(tuple(str, str))): links on the page paired with anchor text,
+#       None if links were not read from the page
+PageState = namedtuple("PageState", [ "etag", "last_modified", "content_hash", "links" ])
+
+class CrawlState:
+    """On disk state kept between crawls of a site, so a re-crawl only
+    processes pages that changed and only writes candidates that were not
+    written before. Pages are kept with their validators, body hash and links
+    in a SQLite database, along with named sets of fingerprints of the
+    candidates already written. Writes are thread safe.
+
+    Attributes:
+        location (str): path of the database file, created if it does not
+            exist
+        commit_every (int): (default=100) number of pages to record before
+            committing them to disk
+    """
+
+    def __init__(self, location, commit_every=100):
+        self.location = location
+        self.commit_every = commit_every
+
+        self._connection = sqlite3.connect(location, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+
+        # fingerprint sets loaded by name, saved back on close
+        self._fingerprints = {}
+
+        with self._lock:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, "
+                "crawled_at REAL NOT NULL, "
+                "etag TEXT, "
+                "last_modified TEXT, "
+                "content_hash TEXT NOT NULL, "
+                "links BLOB)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "name TEXT PRIMARY KEY, "
+                "hashes BLOB NOT NULL)"
+            )
+            self._connection.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def get_page(self, url):
+        """Get the state of a page from the last crawl it was processed in
+
+        Parameters:
+            url (str): url of the page
+
+        Returns:
+            PageState or None: state of the page, None if it has not been
+                processed before
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag, last_modified, content_hash, links FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        etag, last_modified, content_hash, links = row
+        if links is not None:
+            links = [ tuple(link) for link in json.loads(zlib.decompress(links).decode("utf-8")) ]
+
+        return PageState(etag, last_modified, content_hash, links)
+
+    def set_page(self, url, page_state):
+        """Record the state of a processed page, replacing any recorded for
+        the same url
+
+        Parameters:
+            url (str): url of the page
+            page_state (PageState): state of the page
+        """
+        links = page_state.links
+        if links is not None:
+            links = zlib.compress(json.dumps(links).encode("utf-8"))
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, crawled_at, etag, last_modified, content_hash, links) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, time.time(), page_state.etag, page_state.last_modified,
+                    page_state.content_hash, links)
+            )
+
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self._connection.commit()
+                self._uncommitted = 0
+
+    def candidate_fingerprints(self, name=""):
+        """Get a set of fingerprints of candidates already written, changes
+        to the set are saved when the state is closed
+
+        Parameters:
+            name (str): (default="") name of the set, separate wordlists keep
+                separate sets
+
+        Returns:
+            CandidateFingerprints: fingerprints of the candidates
+        """
+        with self._lock:
+            if name not in self._fingerprints:
+                row = self._connection.execute(
+                    "SELECT hashes FROM fingerprints WHERE name = ?", (name,)).fetchone()
+                self._fingerprints[name] = CandidateFingerprints(row[0] if row else b"")
+
+            return self._fingerprints[name]
+
+    def close(self):
+        """Save the fingerprint sets, commit any recorded pages and close the
+        database
+        """
+        with self._lock:
+            for name, fingerprints in self._fingerprints.items():
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO fingerprints (name, hashes) VALUES (?, ?)",
+                    (name, fingerprints.to_bytes())
+                )
+
+            self._connection.commit()
+            self._connection.close()
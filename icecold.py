@@ -3,12 +3,18 @@
 import sys
 import signal
 import os
+import threading
 
-# local imports
+# local imports, the scraper is imported when first needed since its network
+# and parsing dependencies are slow to load
 from args.cmdargparser import *
-from scraper.wordlist_site_scraper import WordListSiteScraper
 from output.output_controller import OutputController
-from wordlist.wordlist_processor import WordListProcessor
+from output.reservoir_sampler import ReservoirSampler
+from output.delta_output import DeltaOutput
+from wordlist.wordlist_processor import WordListProcessor, truncate_candidates
+from wordlist.profile_fanout import ProfileFanOut
+from wordlist.text_stream import read_text_elements
+from scraper.memory_governor import MemoryGovernor, peak_rss
 
 def print_help(flags):
 
@@ -59,6 +65,12 @@ def main(argv):
             short_name="o",
             accepted_type="str"
         ),
+        CmdFlag(
+            "index-every",
+            "Write an offset index of every this many candidates next to the output file, for splitting it between workers (default off)",
+            None,
+            accepted_type="int"
+        ),
         CmdFlag(
             "min-word-len",
             "Minimum word length to accept (default 3)",
@@ -126,6 +138,150 @@ def main(argv):
             "Do not create word chains that only push words together, only use connecting characters",
             False
         ),
+        CmdFlag(
+            "max-pages",
+            "Stop crawling a site after fetching this many pages (default unlimited)",
+            None,
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "max-bytes",
+            "Stop crawling a site after downloading this many bytes (default unlimited)",
+            None,
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "max-time",
+            "Stop crawling a site after this many seconds (default unlimited)",
+            None,
+            accepted_type="float"
+        ),
+        CmdFlag(
+            "max-candidates",
+            "Stop crawling and generating once this many candidates are written, with --profiles each profile is limited separately (default unlimited)",
+            None,
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "sample",
+            "Write a uniform random sample of this many candidates from everything generated (default off)",
+            None,
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "connect-timeout",
+            "Seconds to wait for a connection to a host (default 5)",
+            5.0,
+            accepted_type="float"
+        ),
+        CmdFlag(
+            "read-timeout",
+            "Seconds to wait for each read from a host, slower responses count against the host (default 15)",
+            15.0,
+            accepted_type="float"
+        ),
+        CmdFlag(
+            "page-timeout",
+            "Seconds a page can take to download before it is abandoned (default 60)",
+            60.0,
+            accepted_type="float"
+        ),
+        CmdFlag(
+            "retries",
+            "Number of times to retry a request that timed out or got a server error (default 2)",
+            2,
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "host-failures",
+            "Failed or slow responses in a row before a host is skipped for a while (default 5)",
+            5,
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "concurrency",
+            "Number of pages to fetch at once (default 4)",
+            4,
+            short_name="t",
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "near-dup-threshold",
+            "Skip pages whose text fingerprint differs from a seen page by at most this many bits (default off)",
+            None,
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "sitemap",
+            "Queue the pages listed in robots.txt and sitemap.xml sitemaps, only following links if none are found",
+            False
+        ),
+        CmdFlag(
+            "parse-workers",
+            "Number of processes to parse pages in, 0 parses on the fetch threads (default 0)",
+            0,
+            short_name="P",
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "max-page-size",
+            "Largest page in bytes to download, larger pages are skipped (default 5242880)",
+            5 * 1024 * 1024,
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "no-block-cache",
+            "Process text blocks repeated across pages, like menus and footers, every time they are seen",
+            False
+        ),
+        CmdFlag(
+            "site-workers",
+            "Number of sites from a url file to scrape at once (default 1)",
+            1,
+            short_name="w",
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "max-memory",
+            "Memory budget in megabytes, crawling slows down instead of growing past it (default unlimited)",
+            None,
+            accepted_type="int"
+        ),
+        CmdFlag(
+            "corpus-out",
+            "Save the text of every crawled page to a corpus file to generate from later",
+            None,
+            accepted_type="str"
+        ),
+        CmdFlag(
+            "state",
+            "Keep crawl state in this file between runs, re-crawls skip unchanged pages and only write candidates not written before",
+            None,
+            accepted_type="str"
+        ),
+        CmdFlag(
+            "from-corpus",
+            "Generate from a corpus file saved with --corpus-out instead of scraping a url",
+            None,
+            accepted_type="str"
+        ),
+        CmdFlag(
+            "stdin",
+            "Read text from standard input instead of scraping a url",
+            False
+        ),
+        CmdFlag(
+            "profiles",
+            "Generate several wordlists from one crawl, each line of the file holds the generation flags and output of one profile",
+            None,
+            accepted_type="str"
+        ),
+        CmdFlag(
+            "batch",
+            "Run a file of jobs in one process, each line holds the flags for one job",
+            None,
+            accepted_type="str"
+        ),
     ]
 
     default_flags = [
@@ -142,28 +298,86 @@ def main(argv):
 
         return
 
+    if command.flags["batch"]:
+        run_batch(command.flags["batch"], cmd_flags)
+        return
+
+    if command.flags["index-every"] is not None and command.flags["output"] is None:
+        print("[error] The index-every parameter needs an output file.")
+        print_help(cmd_flags)
+        return
+
     if command.flags["output"] != None:
-        out = OutputController(command.flags["output"])
+        out = OutputController(command.flags["output"], index_every=command.flags["index-every"])
     else:
         out = OutputController("", standard_out=True)
 
+    crawl_state = None
+    fingerprints = None
+    if command.flags["state"] is not None:
+        from corpus.crawl_state import CrawlState
+        crawl_state = CrawlState(command.flags["state"])
+        fingerprints = crawl_state.candidate_fingerprints()
+
+    out = wrap_output(out, command.flags["sample"], fingerprints)
+
+    memory_governor = None
+    if command.flags["max-memory"] is not None:
+        memory_governor = MemoryGovernor(command.flags["max-memory"] * 1024 * 1024)
+
+    corpus_store = None
+    if command.flags["corpus-out"] is not None:
+        from corpus.corpus_store import CorpusStore
+        corpus_store = CorpusStore(command.flags["corpus-out"])
+
+    profiles = []
+
+    try:
+        if command.flags["profiles"] is not None:
+            profiles = load_profiles(command.flags["profiles"], cmd_flags, out, crawl_state)
+            if profiles is None:
+                profiles = []
+                return
+
+        run_command(command, cmd_flags, out, memory_governor, corpus_store, profiles, crawl_state)
+    finally:
+        # profiles without their own output write into the command's output,
+        # so theirs are closed first
+        for _, profile_out in profiles:
+            if profile_out is not out:
+                profile_out.close()
+
+        out.close()
+
+        if crawl_state is not None:
+            report_delta(out, profiles)
+            crawl_state.close()
+
+        if corpus_store is not None:
+            corpus_store.close()
+
+        if memory_governor is not None:
+            report_peak_memory(memory_governor)
+
+def run_command(command, cmd_flags, out, memory_governor=None, corpus_store=None, profiles=None, crawl_state=None):
     if command.flags["url"] and command.flags["url-file"]:
         print("[error] Both url and url-file parameters cannot be used at the same time.")
         print_help(cmd_flags)
         return
 
+    if command.flags["stdin"] and (command.flags["url"] or command.flags["url-file"]):
+        print("[error] The stdin parameter cannot be used with url or url-file parameters.")
+        print_help(cmd_flags)
+        return
+
+    if command.flags["from-corpus"] and (command.flags["url"] or command.flags["url-file"] or command.flags["stdin"]):
+        print("[error] The from-corpus parameter cannot be used with url, url-file or stdin parameters.")
+        print_help(cmd_flags)
+        return
+
     if command.flags["words-only"]:
         command.flags["chain-len"] = 1
 
-    wl_processor = WordListProcessor(
-        out, 
-        max_combo_length=command.flags["chain-len"],
-        min_word_length=command.flags["min-word-len"], 
-        max_word_length=command.flags["max-word-len"],
-        charset=command.flags["charset"],
-        smush_words=not command.flags["no-smush"]
-    )
-
     if command.flags["url-file"]:
         url_file_name = command.flags["url-file"]
 
@@ -173,35 +387,383 @@ def main(argv):
             return
 
         with open(url_file_name, "r") as url_file:
-            urls = url_file.readlines()
+            scrape_url_file(url_file, command, out, memory_governor, corpus_store, profiles, crawl_state)
 
-            # strip whitespace and newlines at end of lines
-            urls = [ str.strip(url) for url in urls ]
+        return        
 
-            for url in urls:
-                # skip empty urls
-                if url == "": continue
+    wl_processor = make_processor(command, out, profiles)
+    candidate_budget = make_candidate_budget(command, profiles)
 
-                scrape_url(url, wl_processor, command)    
+    if command.flags["stdin"]:
+        read_stdin(wl_processor, candidate_budget)
+        return
 
-        return        
+    if command.flags["from-corpus"]:
+        corpus_file_name = command.flags["from-corpus"]
+
+        if not os.path.isfile(corpus_file_name):
+            print("[error] Provided corpus file does not exist")
+            print_help(cmd_flags)
+            return
+
+        read_corpus(corpus_file_name, wl_processor, command, candidate_budget)
+        return
 
     if command.flags["url"]:
-        scrape_url(command.flags["url"], wl_processor, command)
+        scrape_url(
+            command.flags["url"], wl_processor, command, out, memory_governor, corpus_store, crawl_state, 
+            candidate_budget)
     else:
         print("[error] No url provided.")
         print_help(cmd_flags)
 
-def scrape_url(url, wl_processor, command):
+def load_profiles(profile_file_name, cmd_flags, out, crawl_state=None):
+    """Read a profile file, a profile is a line with the generation flags
+    that would be given on the command line, like chain-len, charset and 
+    words-only, along with its own output. Profiles without an output write
+    to the command's output. Empty lines and lines starting with # are 
+    skipped. With crawl state, each profile with its own output only writes
+    candidates it has not written before, tracked by its line in the file. 
+    Returns a list of the parsed profile and its output, or None if the file
+    cannot be used.
+    """
+    if not os.path.isfile(profile_file_name):
+        print("[error] Provided profile file does not exist")
+        print_help(cmd_flags)
+        return None
+
+    profiles = []
+
+    with open(profile_file_name, "r") as profile_file:
+        for line_number, line in enumerate(profile_file, start=1):
+            tokens = line.strip().split()
+
+            if len(tokens) == 0 or tokens[0].startswith("#"):
+                continue
+
+            try:
+                profile = CmdArgParser(" ".join([ sys.argv[0] ] + tokens), cmd_flags)
+            except Exception as e:
+                print("[error] Profile on line {} is invalid: {}".format(line_number, e))
+
+                # close the outputs of the profiles already read
+                for _, profile_out in profiles:
+                    if profile_out is not out:
+                        profile_out.close()
+                return None
+
+            if profile.flags["words-only"]:
+                profile.flags["chain-len"] = 1
+
+            profile_out = out
+            if profile.flags["output"] is not None:
+                profile_out = OutputController(profile.flags["output"], index_every=profile.flags["index-every"])
+
+            fingerprints = None
+            if crawl_state is not None and profile.flags["output"] is not None:
+                fingerprints = crawl_state.candidate_fingerprints("profile-{}".format(line_number))
+
+            profile_out = wrap_output(profile_out, profile.flags["sample"], fingerprints)
+
+            profiles.append((profile, profile_out))
+
+    if len(profiles) == 0:
+        print("[error] Provided profile file has no profiles")
+        return None
+
+    return profiles
+
+def wrap_output(out, sample=None, fingerprints=None):
+    """Wrap an output to only write a sample of the candidates and to only
+    write candidates not in a fingerprint set, each is skipped if None
+    """
+    if fingerprints is not None:
+        out = DeltaOutput(out, fingerprints)
+
+    if sample is not None:
+        out = ReservoirSampler(out, sample)
+
+        # the sample is drawn from new candidates only, and they are recorded
+        # once the sampler writes them
+        if fingerprints is not None:
+            out = DeltaOutput(out, fingerprints, record=False)
+
+    return out
+
+def make_candidate_budget(command, profiles=None):
+    """Make the candidate budget of a run, each profile is limited to the
+    max-candidates on its line, or the command's max-candidates if it has 
+    none
+    """
+    from scraper.crawl_frontier import CandidateBudget
+
+    if not profiles:
+        return CandidateBudget([ command.flags["max-candidates"] ])
+
+    return CandidateBudget([
+        profile.flags["max-candidates"] if profile.flags["max-candidates"] is not None
+            else command.flags["max-candidates"]
+        for profile, _ in profiles
+    ])
+
+def make_processor(command, out, profiles=None):
+    if profiles:
+        return ProfileFanOut([ 
+            make_processor(profile, profile_out) for profile, profile_out in profiles 
+        ])
+
+    return WordListProcessor(
+        out, 
+        max_combo_length=command.flags["chain-len"],
+        min_word_length=command.flags["min-word-len"], 
+        max_word_length=command.flags["max-word-len"],
+        charset=command.flags["charset"],
+        smush_words=not command.flags["no-smush"]
+    )
+
+def scrape_url_file(url_file, command, out, memory_governor=None, corpus_store=None, profiles=None, crawl_state=None):
+    """Scrape every url in a url file with a pool of site workers all writing
+    to the same output. The file is read as the workers need more urls, so 
+    only a few urls are held in memory at once. Progress is reported on 
+    standard error as each site finishes. 
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    workers = max(command.flags["site-workers"], 1)
+
+    # processors keep state between calls, so each worker gets its own
+    worker_state = threading.local()
+
+    # the candidate limits cover the whole run, every site counts against them
+    candidate_budget = make_candidate_budget(command, profiles)
+
+    def scrape_site(url):
+        if not hasattr(worker_state, "processor"):
+            worker_state.processor = make_processor(command, out, profiles)
+
+        return scrape_url(
+            url, worker_state.processor, command, out, memory_governor, corpus_store, crawl_state,
+            candidate_budget)
+
+    progress = { "done" : 0, "failed" : 0 }
+    pending = set()
+
+    def collect(done):
+        """Count finished sites, returns False if a site failed"""
+        succeeded = True
+
+        for future in done:
+            pending.discard(future)
+
+            progress["done"] += 1
+            if not future.result():
+                progress["failed"] += 1
+                succeeded = False
+
+        print(
+            "[progress] {} sites done, {} failed, {} in progress".format(
+                progress["done"], progress["failed"], len(pending)),
+            file=sys.stderr
+        )
+
+        return succeeded
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for line in url_file:
+            # strip whitespace and newlines at end of lines
+            url = line.strip()
+
+            # skip empty urls
+            if url == "": continue
+
+            # the candidate limits were reached, there is nothing left to write
+            if candidate_budget.exhausted():
+                break
+
+            pending.add(executor.submit(scrape_site, url))
+
+            # only read another url once a worker is free
+            if len(pending) < workers:
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            if not collect(done):
+                break
+
+        # a failed site halts the run, sites not yet started are dropped
+        if progress["failed"] > 0:
+            for future in list(pending):
+                if future.cancel():
+                    pending.discard(future)
+
+        while len(pending) > 0:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+def run_batch(batch_file_name, cmd_flags):
+    """Run each job in a batch file within this process, a job is a line with
+    the same flags that would be given on the command line. Empty lines and
+    lines starting with # are skipped, and a failing job does not stop the
+    jobs after it.
+    """
+    if not os.path.isfile(batch_file_name):
+        print("[error] Provided batch file does not exist")
+        print_help(cmd_flags)
+        return
+
+    with open(batch_file_name, "r") as batch_file:
+        for line_number, line in enumerate(batch_file, start=1):
+            job = line.strip()
+
+            if job == "" or job.startswith("#"):
+                continue
+
+            tokens = job.split()
+
+            if "--batch" in tokens:
+                print("[error] Batch job on line {} cannot run another batch".format(line_number))
+                continue
+
+            try:
+                main([ sys.argv[0] ] + tokens)
+            except Exception as e:
+                print("[error] Batch job on line {} failed: {}".format(line_number, e))
+
+def scrape_url(url, wl_processor, command, out, memory_governor=None, corpus_store=None, crawl_state=None,
+    candidate_budget=None):
+    import asyncio
+    from scraper.wordlist_site_scraper import WordListSiteScraper, ScrapeError
+    from scraper.circuit_breaker import CircuitBreaker
+
+    circuit_breaker = CircuitBreaker(
+        failure_threshold=command.flags["host-failures"],
+        slow_threshold=command.flags["read-timeout"]
+    )
+
     scraper = WordListSiteScraper(
         url, 
         wl_processor, 
         depth=command.flags["depth"],
         leave_domain=not command.flags["no-leave-domain"],
         skip_on_no_connect=command.flags["ignore-unresponsive"],
-        user_agent=command.flags["ua"]
+        user_agent=command.flags["ua"],
+        max_pages=command.flags["max-pages"],
+        max_bytes=command.flags["max-bytes"],
+        max_time=command.flags["max-time"],
+        max_candidates=command.flags["max-candidates"],
+        candidate_budget=candidate_budget,
+        concurrency=command.flags["concurrency"],
+        near_duplicate_threshold=command.flags["near-dup-threshold"],
+        block_cache=not command.flags["no-block-cache"],
+        memory_governor=memory_governor,
+        use_sitemap=command.flags["sitemap"],
+        max_page_size=command.flags["max-page-size"],
+        parse_workers=command.flags["parse-workers"],
+        corpus_store=corpus_store,
+        connect_timeout=command.flags["connect-timeout"],
+        read_timeout=command.flags["read-timeout"],
+        page_timeout=command.flags["page-timeout"],
+        retries=command.flags["retries"],
+        circuit_breaker=circuit_breaker,
+        crawl_state=crawl_state
+    )
+
+    try:
+        asyncio.run(write_candidates(scraper, processor_outputs(wl_processor)))
+    except ScrapeError as e:
+        print("[error] {}, to ignore unresponsive urls use --ignore-unresponsive".format(e))
+        return False
+    finally:
+        if scraper.near_duplicates is not None:
+            print("[near-dup] {}: {}".format(url, scraper.near_duplicates.summary()), file=sys.stderr)
+        if scraper.block_cache is not None:
+            print("[block-cache] {}: {}".format(url, scraper.block_cache.summary()), file=sys.stderr)
+        if crawl_state is not None:
+            print("[delta] {}: {} pages unchanged since the last crawl".format(url, scraper.unchanged_pages), file=sys.stderr)
+        if circuit_breaker.trips > 0:
+            print("[circuit-breaker] {}: {}".format(url, circuit_breaker.summary()), file=sys.stderr)
+
+    return True
+
+async def write_candidates(scraper, outputs):
+    async for profile, block in scraper.candidate_batches(decode=False, with_profile=True):
+        outputs[profile].write_bytes(block)
+
+def processor_outputs(wl_processor):
+    """Get the outputs of a processor, one for each of its profiles"""
+    if isinstance(wl_processor, ProfileFanOut):
+        return wl_processor.outputs
+    return [ wl_processor.output ]
+
+def process_limited(wl_processor, elements, candidate_budget):
+    """Process elements, writing no more candidates for each profile than 
+    the budget allows
+    """
+    blocks = wl_processor.generate(elements)
+    if not isinstance(wl_processor, ProfileFanOut):
+        blocks = [ blocks ]
+
+    for profile, (output, block) in enumerate(zip(processor_outputs(wl_processor), blocks)):
+        amount = block.count(b"\n")
+        allowed = candidate_budget.take(amount, profile)
+        if allowed < amount:
+            block = truncate_candidates(block, allowed)
+
+        if block:
+            output.write_bytes(block)
+
+def read_stdin(wl_processor, candidate_budget):
+    for elements in read_text_elements(sys.stdin.buffer):
+        process_limited(wl_processor, elements, candidate_budget)
+
+        if candidate_budget.exhausted():
+            break
+
+def report_peak_memory(memory_governor):
+    peak = peak_rss()
+    if peak is None:
+        return
+
+    print(
+        "[memory] peak rss {:.1f} MiB of {:.1f} MiB budget".format(
+            peak / (1024 * 1024), memory_governor.max_memory / (1024 * 1024)),
+        file=sys.stderr
     )
 
+def read_corpus(corpus_file_name, wl_processor, command, candidate_budget, bank_size=100):
+    from corpus.corpus_store import CorpusStore
+    from scraper.block_cache import BlockCache
+
+    block_cache = None if command.flags["no-block-cache"] else BlockCache()
+
+    corpus_store = CorpusStore(corpus_file_name)
+
+    try:
+        for _, elements in corpus_store.iter_pages():
+            if block_cache is not None:
+                elements = block_cache.filter_new(elements)
+
+            for i in range(0, len(elements), bank_size):
+                process_limited(wl_processor, elements[i:i+bank_size], candidate_budget)
+
+                if candidate_budget.exhausted():
+                    return
+    finally:
+        corpus_store.close()
+
+def report_delta(out, profiles):
+    """Print how many new candidates each delta output wrote"""
+    shares_output = len(profiles) == 0
+
+    for profile, profile_out in profiles:
+        if isinstance(profile_out, DeltaOutput):
+            print("[delta] {}: {}".format(profile.flags["output"], profile_out.summary()), file=sys.stderr)
+        else:
+            shares_output = True
+
+    if shares_output:
+        print("[delta] {}".format(out.summary()), file=sys.stderr)
+
 def sigint_handler(sig, frame):
     print("Interrupt caught, exiting...")
     sys.exit(0)
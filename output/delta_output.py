@@ -0,0 +1,228 @@
+import heapq
+import sys
+import threading
+
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+
+__all__ = [
+    "CandidateFingerprints",
+    "DeltaOutput"
+]
+
+class CandidateFingerprints:
+    """Compact set of 64 bit fingerprints of candidates, thread safe. 
+    Fingerprints are kept in sorted arrays at 8 bytes each and searched with
+    bisection. New fingerprints are collected in a small buffer, which is
+    sorted into a new array once full. Arrays of similar size are merged as
+    they build up, so there are only ever a few to search and each
+    fingerprint is merged a few times. A bitmap of 16 bits per fingerprint
+    answers most lookups of fingerprints not in the set without searching.
+
+    Attributes:
+        data (bytes): (default=b"") fingerprints saved with to_bytes
+    """
+
+    # most new fingerprints to hold before they are sorted into an array
+    BUFFER_SIZE = 65536
+
+    # arrays are merged until each is this many times the size of the next
+    MERGE_FACTOR = 4
+
+    # bitmap bits per fingerprint, and the fewest bits as a power of two
+    BITS_PER_FINGERPRINT = 16
+    MIN_BITMAP_POWER = 20
+
+    def __init__(self, data=b""):
+        saved = array("Q")
+        saved.frombytes(data)
+        if sys.byteorder != "little":
+            saved.byteswap()
+
+        # sorted arrays from largest to smallest
+        self._runs = [ saved ] if len(saved) > 0 else []
+        self._buffer = set()
+        self._lock = threading.Lock()
+
+        self._count = len(saved)
+        self._build_bitmap()
+
+    def __len__(self):
+        return self._count
+
+    def _build_bitmap(self):
+        """Size the bitmap for the fingerprints held and mark them all"""
+        # room for the set to double before it is built again
+        power = self.MIN_BITMAP_POWER
+        while 1 << power < 2 * self._count * self.BITS_PER_FINGERPRINT:
+            power += 1
+
+        # the top bits of a fingerprint pick its bit
+        self._shift = 64 - power
+        self._bitmap = bytearray(1 << (power - 3))
+
+        for run in self._runs:
+            for key in run:
+                self._mark(key)
+        for key in self._buffer:
+            self._mark(key)
+
+    def _mark(self, key):
+        bit = key >> self._shift
+        self._bitmap[bit >> 3] |= 1 << (bit & 7)
+
+    def _is_marked(self, key):
+        bit = key >> self._shift
+        return self._bitmap[bit >> 3] & (1 << (bit & 7)) != 0
+
+    def _fingerprint(self, candidate):
+        return int.from_bytes(blake2b(candidate, digest_size=8).digest(), "little")
+
+    def _has(self, key):
+        if not self._is_marked(key):
+            return False
+
+        if key in self._buffer:
+            return True
+
+        for run in self._runs:
+            i = bisect_left(run, key)
+            if i < len(run) and run[i] == key:
+                return True
+
+        return False
+
+    def _flush(self):
+        """Sort the buffer into a new array, merging arrays that have grown
+        close in size
+        """
+        if len(self._buffer) > 0:
+            self._runs.append(array("Q", sorted(self._buffer)))
+            self._buffer = set()
+
+        while len(self._runs) > 1 and len(self._runs[-2]) < self.MERGE_FACTOR * len(self._runs[-1]):
+            smaller = self._runs.pop()
+            self._runs[-1] = array("Q", heapq.merge(self._runs[-1], smaller))
+
+    def __contains__(self, candidate):
+        key = self._fingerprint(candidate)
+
+        with self._lock:
+            return self._has(key)
+
+    def add(self, candidate):
+        """Add a candidate to the set
+
+        Parameters:
+            candidate (bytes): encoded candidate, without its newline
+
+        Returns:
+            bool: True if the candidate was not in the set, otherwise False
+        """
+        key = self._fingerprint(candidate)
+
+        with self._lock:
+            if self._has(key):
+                return False
+
+            self._buffer.add(key)
+            self._mark(key)
+            self._count += 1
+
+            if len(self._buffer) >= self.BUFFER_SIZE:
+                self._flush()
+
+            if self._count * self.BITS_PER_FINGERPRINT > len(self._bitmap) * 8:
+                self._build_bitmap()
+
+            return True
+
+    def to_bytes(self):
+        """Get the fingerprints in a form that can be loaded again, merging
+        them into a single sorted array
+
+        Returns:
+            bytes: sorted little endian 64 bit fingerprints
+        """
+        with self._lock:
+            self._flush()
+
+            while len(self._runs) > 1:
+                smaller = self._runs.pop()
+                self._runs[-1] = array("Q", heapq.merge(self._runs[-1], smaller))
+
+            merged = self._runs[0] if self._runs else array("Q")
+
+        if sys.byteorder != "little":
+            merged = array("Q", merged)
+            merged.byteswap()
+
+        return merged.tobytes()
+
+class DeltaOutput:
+    """Output that only writes candidates that are not in a fingerprint set,
+    adding the ones it writes, so a run only writes what earlier runs sharing
+    the set have not. Writes are thread safe.
+
+    An output that drops candidates itself, like a ReservoirSampler, goes
+    between a recording delta output and a non-recording one, so only the
+    candidates that are finally written are added to the set.
+
+    Attributes:
+        output_controller (OutputController): output to write new candidates
+            to
+        fingerprints (CandidateFingerprints): candidates already written
+        record (bool): (default=True) add the candidates written to the set,
+            if False the set is only checked
+    """
+
+    def __init__(self, output_controller, fingerprints, record=True):
+        self._output = output_controller
+        self.fingerprints = fingerprints
+        self.record = record
+
+        self._lock = threading.Lock()
+
+        self.written = 0
+        self.skipped = 0
+
+    def write(self, line):
+        """Write to the output
+
+        Parameters:
+            line (str): newline terminated candidates
+        """
+        self.write_bytes(line.encode("utf-8"))
+
+    def write_bytes(self, data):
+        """Write already encoded data to the output
+
+        Parameters:
+            data (bytes): newline terminated candidates
+        """
+        lines = bytes(data).split(b"\n")[:-1]
+
+        with self._lock:
+            if self.record:
+                new_lines = [ line for line in lines if self.fingerprints.add(line) ]
+            else:
+                new_lines = [ line for line in lines if line not in self.fingerprints ]
+
+            self.written += len(new_lines)
+            self.skipped += len(lines) - len(new_lines)
+
+            if new_lines:
+                self._output.write_bytes(b"\n".join(new_lines) + b"\n")
+
+    def close(self):
+        """Close the output"""
+        self._output.close()
+
+    def summary(self):
+        """Get a short human readable summary of the output
+
+        Returns:
+            str: summary of new candidates passed on and candidates skipped
+        """
+        return "{} new candidates, skipped {} already written".format(self.written, self.skipped)
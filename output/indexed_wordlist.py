@@ -0,0 +1,238 @@
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+
+__all__ = [
+    "INDEX_SUFFIX",
+    "IndexWriter",
+    "IndexedWordlist"
+]
+
+# the index of a wordlist is kept next to it with this suffix
+INDEX_SUFFIX = ".idx"
+
+# index files start with a header of the magic, the number of entries between
+# indexed offsets, the number of entries and the size of the wordlist, then
+# hold the byte offset of every indexed entry, all little endian
+INDEX_MAGIC = b"ICEIDX01"
+INDEX_HEADER = struct.Struct("<8sQQQ")
+
+def _to_little_endian(offsets):
+    if sys.byteorder != "little":
+        offsets = array("Q", offsets)
+        offsets.byteswap()
+    return offsets
+
+class IndexWriter:
+    """Writes the offset index of a newline terminated wordlist as the
+    wordlist is written, holding no offsets in memory. The header is only
+    filled in on close, so an index left by an interrupted run is never read
+    as complete.
+
+    Attributes:
+        index_file (file-like): binary file to write the index to
+        every (int): number of entries between indexed offsets
+    """
+
+    def __init__(self, index_file, every):
+        if every <= 0:
+            raise Exception("Index interval must be greater than 0, {} provided".format(every))
+
+        self._file = index_file
+        self.every = every
+
+        self.count = 0
+        self.size = 0
+
+        self._file.write(INDEX_HEADER.pack(b"\x00" * len(INDEX_MAGIC), every, 0, 0))
+
+    def add_block(self, data):
+        """Index a block of entries written to the end of the wordlist
+
+        Parameters:
+            data (bytes): newline terminated entries
+        """
+        entries = data.count(b"\n")
+
+        # local number of the first entry in the block that is indexed
+        first = -self.count % self.every
+
+        if first < entries:
+            # offset of entry j within the block is the length of the j
+            # entries before it plus their newlines
+            lengths = [ 0 ]
+            lengths.extend(accumulate(map(len, data.split(b"\n"))))
+
+            offsets = array("Q", [
+                self.size + lengths[j] + j for j in range(first, entries, self.every)
+            ])
+            self._file.write(_to_little_endian(offsets).tobytes())
+
+        self.count += entries
+        self.size += len(data)
+
+    def close(self):
+        """Write the header and close the index"""
+        self._file.seek(0)
+        self._file.write(INDEX_HEADER.pack(INDEX_MAGIC, self.every, self.count, self.size))
+        self._file.close()
+
+class IndexedWordlist:
+    """Read only view of a wordlist written with an offset index. The
+    wordlist is memory mapped, so it can be split into byte balanced ranges
+    of entries without reading it, and entries are returned as memoryview
+    slices of the mapping without copying them. Slices must be released
+    before the wordlist is closed.
+
+    Attributes:
+        location (str): path of the wordlist, its index is read from the same
+            path with INDEX_SUFFIX added
+
+    Raises:
+        Exception: if the index is missing, incomplete or does not match the
+            wordlist
+    """
+
+    def __init__(self, location):
+        self.location = location
+
+        index_location = location + INDEX_SUFFIX
+        if not os.path.isfile(index_location):
+            raise Exception("No index found for wordlist '{}'".format(location))
+
+        with open(index_location, "rb") as index_file:
+            header = index_file.read(INDEX_HEADER.size)
+            offsets = index_file.read()
+
+        if len(header) < INDEX_HEADER.size:
+            raise Exception("Index of wordlist '{}' is incomplete".format(location))
+
+        magic, self.every, self.count, self.size = INDEX_HEADER.unpack(header)
+        if magic != INDEX_MAGIC:
+            raise Exception("Index of wordlist '{}' is incomplete or not an index".format(location))
+
+        self._offsets = array("Q")
+        self._offsets.frombytes(offsets)
+        if sys.byteorder != "little":
+            self._offsets.byteswap()
+
+        if os.path.getsize(location) != self.size:
+            raise Exception("Index of wordlist '{}' does not match its size".format(location))
+
+        self._file = open(location, "rb")
+        self._map = None
+
+        # an empty file cannot be mapped
+        if self.size > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+        else:
+            self._view = memoryview(b"")
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, entry):
+        """Get the byte offset an entry starts at, found from the nearest
+        indexed offset before it
+
+        Parameters:
+            entry (int): number of the entry, the number of entries gives the
+                end of the wordlist
+
+        Returns:
+            int: byte offset of the entry
+        """
+        if entry >= self.count:
+            return self.size
+
+        position = self._offsets[entry // self.every]
+        for _ in range(entry % self.every):
+            position = self._map.find(b"\n", position) + 1
+
+        return position
+
+    def byte_range(self, start, stop):
+        """Get the bytes a range of entries covers, for readers that seek in
+        the wordlist file themselves
+
+        Parameters:
+            start (int): first entry of the range
+            stop (int): entry after the last entry of the range
+
+        Returns:
+            tuple (int, int): byte offset of the start and end of the range
+        """
+        return self.offset(start), self.offset(stop)
+
+    def ranges(self, parts):
+        """Split the wordlist into ranges of entries with close to the same
+        number of bytes each, ranges start on indexed entries so finding them
+        reads nothing from the wordlist
+
+        Parameters:
+            parts (int): number of ranges wanted, fewer are returned if the
+                wordlist does not have enough indexed entries
+
+        Returns:
+            list (tuple(int, int)): start and stop entry of each range
+        """
+        bounds = [ 0 ]
+
+        for part in range(1, max(parts, 1)):
+            # first indexed entry at or after an even share of the bytes
+            target = self.size * part // parts
+            entry = min(bisect_left(self._offsets, target) * self.every, self.count)
+
+            if entry > bounds[-1]:
+                bounds.append(entry)
+
+        if self.count > bounds[-1]:
+            bounds.append(self.count)
+
+        return list(zip(bounds, bounds[1:]))
+
+    def slice(self, start, stop):
+        """Get a range of entries without copying them
+
+        Parameters:
+            start (int): first entry of the range
+            stop (int): entry after the last entry of the range
+
+        Returns:
+            memoryview: newline terminated entries of the range
+        """
+        begin, end = self.byte_range(start, stop)
+        return self._view[begin:end]
+
+    def entries(self, start=0, stop=None):
+        """Read a range of entries one at a time without copying them
+
+        Parameters:
+            start (int): (default=0) first entry of the range
+            stop (int): (default=None) entry after the last entry of the
+                range, None reads to the end
+
+        Returns:
+            generator (memoryview): each entry, without its newline
+        """
+        if stop is None or stop > self.count:
+            stop = self.count
+
+        position = self.offset(start)
+        for _ in range(start, stop):
+            end = self._map.find(b"\n", position)
+            yield self._view[position:end]
+            position = end + 1
+
+    def close(self):
+        """Unmap and close the wordlist"""
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
@@ -1,33 +1,76 @@
 import os
 import stat
+import sys
+import threading
+
+from output.indexed_wordlist import INDEX_SUFFIX, IndexWriter
 
 class OutputController:
-    """Buffer for writing to disk or to standard out
+    """Buffer for writing to disk or to standard out, writes are thread safe
 
     Attributes:
         file_location (str): location to write to on disk, this argument
             is ignored if standard_out is set to True
         standard_out (bool): (default=False) if set to true then all given 
             input is written to standard out (command line)
+        index_every (int): (default=None) write an offset index of every
+            this many lines next to the file, so it can be split and read 
+            with IndexedWordlist, None writes no index
     """
 
-    def __init__(self, file_location, standard_out=False):
+    def __init__(self, file_location, standard_out=False, index_every=None):
         self.file_location = file_location
         self._stdout = standard_out
+        self._lock = threading.Lock()
+        self._index = None
 
         if not standard_out:
             self._file_descriptor = self._try_open(file_location)
 
+        if index_every is not None:
+            if standard_out:
+                raise Exception("An index can only be written for an output file")
+
+            self._index = IndexWriter(self._try_open(file_location + INDEX_SUFFIX), index_every)
+
+    ENCODING = "utf-8"
+
     def write(self, line):
         """Write to the output
 
         Parameters:
             line (str): line to write to output stream
         """
+        self.write_bytes(line.encode(self.ENCODING))
+
+    def write_bytes(self, data):
+        """Write already encoded data to the output
+
+        Parameters:
+            data (bytes): bytes to write to output stream
+        """
+        with self._lock:
+            if self._stdout:
+                # anything printed as text must land before the raw bytes
+                sys.stdout.flush()
+                sys.stdout.buffer.write(data)
+            else:
+                self._file_descriptor.write(data)
+
+                if self._index is not None:
+                    self._index.add_block(data)
+
+    def close(self):
+        """Flush anything buffered and close the output, standard out is only
+        flushed
+        """
         if self._stdout:
-            print(line, end="")
+            sys.stdout.flush()
         else:
-            self._file_descriptor.write(line)
+            self._file_descriptor.close()
+
+            if self._index is not None:
+                self._index.close()
 
     def _have_permissions(self, location):
         """Return true if there is sufficient permissions to write to the given
@@ -60,7 +103,7 @@ class OutputController:
             Exception: on insufficient permissions to requested location
         """
         if self._have_permissions(location):
-            return open(location, 'w')
+            return open(location, 'wb')
 
         raise Exception(
             "You do not have permissions to write to given location '{}'".format(location)
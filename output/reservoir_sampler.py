@@ -0,0 +1,86 @@
+import math
+import random
+import threading
+
+class ReservoirSampler:
+    """Output that keeps a uniform random sample of a fixed number of the
+    candidates written to it, and writes the sample to another output when
+    closed. Memory use is fixed by the sample size no matter how many
+    candidates are written. Writes are thread safe.
+
+    Uses reservoir sampling with geometric skips (Algorithm L), so only the
+    candidates that make it into the sample cost any work beyond splitting
+    the blocks they arrive in.
+
+    Attributes:
+        output_controller (OutputController): output to write the sample to
+        sample_size (int): number of candidates to keep
+    """
+
+    def __init__(self, output_controller, sample_size):
+        if sample_size <= 0:
+            raise Exception("Sample size must be greater than 0, {} provided".format(sample_size))
+
+        self._output = output_controller
+        self.sample_size = sample_size
+
+        self._reservoir = []
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+        # number of candidates seen, and the index of the next one to sample
+        self.seen = 0
+        self._weight = 1.0
+        self._next_index = None
+
+    def _skip(self):
+        """Move the next sampled index forward by a random skip"""
+        # 1 - random() is never 0, so its log is always defined
+        self._weight *= math.exp(math.log(1.0 - self._random.random()) / self.sample_size)
+        skip = math.floor(math.log(1.0 - self._random.random()) / math.log(1.0 - self._weight))
+        self._next_index += skip + 1
+
+    def write(self, line):
+        """Write to the output
+
+        Parameters:
+            line (str): newline terminated candidates
+        """
+        self.write_bytes(line.encode("utf-8"))
+
+    def write_bytes(self, data):
+        """Write already encoded data to the output
+
+        Parameters:
+            data (bytes): newline terminated candidates
+        """
+        lines = bytes(data).split(b"\n")[:-1]
+
+        with self._lock:
+            start = self.seen
+            self.seen += len(lines)
+
+            # fill the reservoir before sampling
+            free = self.sample_size - len(self._reservoir)
+            if free > 0:
+                self._reservoir.extend(lines[:free])
+
+                if len(self._reservoir) < self.sample_size:
+                    return
+
+                self._next_index = self.sample_size - 1
+                self._skip()
+
+            while self._next_index < self.seen:
+                slot = self._random.randrange(self.sample_size)
+                self._reservoir[slot] = lines[self._next_index - start]
+                self._skip()
+
+    def close(self):
+        """Write the sample to the output and close it"""
+        with self._lock:
+            if self._reservoir:
+                self._output.write_bytes(b"\n".join(self._reservoir) + b"\n")
+            self._reservoir = []
+
+        self._output.close()
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+__all__ = [
+    "BlockCache"
+]
+
+class BlockCache:
+    """Bounded least recently used cache of text element hashes, used to only
+    process blocks that repeat across pages, such as navigation bars, footers
+    and cookie banners, the first time they are seen
+
+    Attributes:
+        max_entries (int): (default=65536) number of element hashes to
+            remember, the least recently seen are forgotten first
+    """
+
+    def __init__(self, max_entries=65536):
+        self.max_entries = max_entries
+        self._hashes = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._hashes)
+
+    @property
+    def hit_rate(self):
+        """float: fraction of elements looked up that were already cached"""
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
+
+    def filter_new(self, elements):
+        """Get the elements that are not in the cache, adding them to it
+
+        Parameters:
+            elements (list(str)): text elements to filter
+
+        Returns:
+            list (str): elements not seen before, in the order given
+        """
+        new_elements = []
+
+        for element in elements:
+            key = hash(element)
+
+            if key in self._hashes:
+                self._hashes.move_to_end(key)
+                self.hits += 1
+                continue
+
+            self.misses += 1
+            self._hashes[key] = None
+            new_elements.append(element)
+
+            if len(self._hashes) > self.max_entries:
+                self._hashes.popitem(last=False)
+
+        return new_elements
+
+    def summary(self):
+        """Get a short description of the cache hit rate
+
+        Returns:
+            str: summary of cache lookups
+        """
+        return "skipped {} of {} text elements as repeated blocks ({:.1%} hit rate)".format(
+            self.hits, self.hits + self.misses, self.hit_rate
+        )
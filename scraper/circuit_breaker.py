@@ -0,0 +1,122 @@
+import threading
+import time
+
+__all__ = [
+    "CircuitBreaker"
+]
+
+class CircuitBreaker:
+    """Per host circuit breaker, hosts that fail or respond slowly too many
+    times in a row are not requested again until a cool down has passed.
+    After the cool down one trial request is let through and others are
+    refused until it finishes, a success closes the circuit and a failure
+    opens it again. Thread safe.
+
+    Attributes:
+        failure_threshold (int): (default=5) failed or slow responses in a row
+            before a host's circuit opens
+        slow_threshold (float): (default=None) seconds a response can take
+            before it counts as a failure, None only counts errors
+        cooldown (float): (default=30.0) seconds a host is skipped for once
+            its circuit opens
+    """
+
+    def __init__(self, failure_threshold=5, slow_threshold=None, cooldown=30.0):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.slow_threshold = slow_threshold
+        self.cooldown = cooldown
+
+        # host to failures in a row, and host to the time its circuit closes
+        self._failures = {}
+        self._open_until = {}
+
+        # hosts with a trial request in flight after their cool down
+        self._trials = set()
+        self._lock = threading.Lock()
+
+        self.trips = 0
+        self.refused = 0
+
+    def is_open(self, host):
+        """Returns if requests to a host are currently being refused
+
+        Parameters:
+            host (str): host name
+
+        Returns:
+            bool: True if the host is being skipped, otherwise False
+        """
+        with self._lock:
+            open_until = self._open_until.get(host)
+            return open_until is not None and time.monotonic() < open_until
+
+    def allow(self, host):
+        """Returns if a request to a host should be made, refused requests are
+        counted
+
+        Parameters:
+            host (str): host name
+
+        Returns:
+            bool: True if the request can be made, otherwise False
+        """
+        with self._lock:
+            open_until = self._open_until.get(host)
+            if open_until is None:
+                return True
+
+            if time.monotonic() < open_until or host in self._trials:
+                self.refused += 1
+                return False
+
+            # half open, only this request is let through until it finishes
+            self._trials.add(host)
+            return True
+
+    def record_success(self, host, elapsed=0.0):
+        """Record a response from a host, slow responses count as failures
+
+        Parameters:
+            host (str): host name
+            elapsed (float): (default=0.0) seconds the response took
+        """
+        if self.slow_threshold is not None and elapsed > self.slow_threshold:
+            self.record_failure(host)
+            return
+
+        with self._lock:
+            self._failures.pop(host, None)
+
+            # only the trial closes the circuit, a request that started
+            # before the circuit opened says little about the host now
+            if host in self._trials:
+                self._trials.discard(host)
+                del self._open_until[host]
+
+    def record_failure(self, host):
+        """Record a failed request to a host, opening its circuit once the
+        threshold is reached
+
+        Parameters:
+            host (str): host name
+        """
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+
+            # a failed trial opens the circuit again for another cool down
+            if host in self._trials:
+                self._trials.discard(host)
+                self._open_until[host] = time.monotonic() + self.cooldown
+                self.trips += 1
+            elif failures >= self.failure_threshold and host not in self._open_until:
+                self._open_until[host] = time.monotonic() + self.cooldown
+                self.trips += 1
+
+    def summary(self):
+        """Get a short human readable summary of the breaker
+
+        Returns:
+            str: summary of hosts tripped and requests refused
+        """
+        return "{} host circuits opened, {} requests refused".format(self.trips, self.refused)
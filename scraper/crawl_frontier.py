@@ -0,0 +1,257 @@
+import heapq
+import threading
+import time
+
+__all__ = [
+    "CandidateBudget",
+    "CrawlBudget",
+    "CrawlFrontier"
+]
+
+class CandidateBudget:
+    """Thread safe count of the candidates written for each profile against
+    an optional limit for each, a limit of None is never reached. Generating
+    is over once every profile has reached its limit.
+
+    Attributes:
+        limits (list(int)): (default=[None]) most candidates to write for each
+            profile
+    """
+
+    def __init__(self, limits=[ None ]):
+        self.limits = list(limits)
+        self.counts = [ 0 ] * len(self.limits)
+
+        self._lock = threading.Lock()
+
+    @property
+    def total(self):
+        """int: candidates written across all profiles"""
+        return sum(self.counts)
+
+    def remaining(self, profile=0):
+        """Get how many more candidates a profile can write
+
+        Parameters:
+            profile (int): (default=0) index of the profile
+
+        Returns:
+            int or None: candidates left, None if there is no limit
+        """
+        with self._lock:
+            if self.limits[profile] is None:
+                return None
+            return max(self.limits[profile] - self.counts[profile], 0)
+
+    def take(self, amount, profile=0):
+        """Record candidates about to be written for a profile, granting no 
+        more than its limit allows
+
+        Parameters:
+            amount (int): number of candidates to write
+            profile (int): (default=0) index of the profile
+
+        Returns:
+            int: number of the candidates that can be written
+        """
+        with self._lock:
+            limit = self.limits[profile]
+            if limit is not None:
+                amount = min(amount, max(limit - self.counts[profile], 0))
+
+            self.counts[profile] += amount
+            return amount
+
+    def exhausted(self):
+        """Returns if every profile has reached its limit
+
+        Returns:
+            bool: True if generating should stop, otherwise False
+        """
+        with self._lock:
+            return all(
+                limit is not None and count >= limit 
+                for limit, count in zip(self.limits, self.counts)
+            )
+
+class CrawlBudget:
+    """Tracks the resources spent by a crawl against a set of optional limits,
+    a limit of None is never exhausted
+
+    Attributes:
+        max_pages (int): (default=None) maximum number of pages to fetch
+        max_bytes (int): (default=None) maximum number of response bytes to
+            download
+        max_time (float): (default=None) maximum number of seconds to crawl for
+        max_candidates (int): (default=None) maximum number of candidates to
+            generate before the crawl stops
+        candidate_budget (CandidateBudget): (default=None) budget to count 
+            candidates against instead of max_candidates, it can hold a limit
+            for each profile and be shared between crawls
+    """
+
+    def __init__(self, max_pages=None, max_bytes=None, max_time=None, max_candidates=None,
+        candidate_budget=None):
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.max_time = max_time
+
+        if candidate_budget is None:
+            candidate_budget = CandidateBudget([ max_candidates ])
+        self.candidate_budget = candidate_budget
+
+        self.pages = 0
+        self.bytes = 0
+
+        self._start_time = None
+
+    def start(self):
+        """Start the crawl clock"""
+        self._start_time = time.monotonic()
+
+    @property
+    def elapsed(self):
+        """float: seconds since the budget was started"""
+        if self._start_time is None:
+            return 0.0
+        return time.monotonic() - self._start_time
+
+    def record_page(self, size):
+        """Record a fetched page against the budget
+
+        Parameters:
+            size (int): size of the page body in bytes
+        """
+        self.pages += 1
+        self.bytes += size
+
+    def record_bytes(self, size):
+        """Record downloaded bytes that did not give a page against the budget
+
+        Parameters:
+            size (int): number of bytes downloaded
+        """
+        self.bytes += size
+
+    def take_candidates(self, amount, profile=0):
+        """Record generated candidates against the budget, granting no more
+        than the profile's limit allows
+
+        Parameters:
+            amount (int): number of candidates generated
+            profile (int): (default=0) index of the profile they are for
+
+        Returns:
+            int: number of the candidates that can be written
+        """
+        return self.candidate_budget.take(amount, profile)
+
+    def _reached(self, value, limit):
+        return limit is not None and value >= limit
+
+    def exhausted(self, pending_pages=0):
+        """Returns if any of the limits has been reached, checked before
+        starting another fetch
+
+        Parameters:
+            pending_pages (int): (default=0) pages being fetched that have not
+                been recorded yet
+
+        Returns:
+            bool: True if the crawl should stop, otherwise False
+        """
+        return (
+            self._reached(self.pages + pending_pages, self.max_pages) or
+            self._reached(self.bytes, self.max_bytes) or
+            self.generation_exhausted()
+        )
+
+    def generation_exhausted(self):
+        """Returns if the candidate or time limit has been reached, pages
+        already fetched are still generated from while neither is
+
+        Returns:
+            bool: True if generating should stop, otherwise False
+        """
+        return (
+            self.candidate_budget.exhausted() or
+            self._reached(self.elapsed, self.max_time)
+        )
+
+class CrawlFrontier:
+    """Priority queue of links waiting to be crawled. Links on the same domain,
+    at a shallower depth, and with more anchor text are visited first, so a
+    limited budget is spent on the pages most likely to be useful. Each url is
+    only queued once.
+    """
+
+    # priority penalty for each level of depth
+    DEPTH_WEIGHT = 10
+    # priority penalty for links leaving the domain of the crawl
+    OFF_DOMAIN_WEIGHT = 5
+    # priority bonus per word of anchor text, and the most words counted
+    ANCHOR_WORD_WEIGHT = 1
+    MAX_ANCHOR_WORDS = 5
+
+    def __init__(self):
+        self._heap = []
+        self._seen = set()
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _get_priority(self, depth, same_domain, anchor_text):
+        """Get the priority of a link, lower values are visited first
+
+        Parameters:
+            depth (int): depth of the link from the start of the crawl
+            same_domain (bool): if the link stays within the crawled domain
+            anchor_text (str): text of the link's anchor element
+
+        Returns:
+            int: priority of the link
+        """
+        anchor_words = min(len(anchor_text.split()), self.MAX_ANCHOR_WORDS)
+
+        priority = depth * self.DEPTH_WEIGHT
+        if not same_domain:
+            priority += self.OFF_DOMAIN_WEIGHT
+        priority -= anchor_words * self.ANCHOR_WORD_WEIGHT
+
+        return priority
+
+    def push(self, url, depth, same_domain=True, anchor_text=""):
+        """Queue a link to be crawled, links that have already been queued are
+        ignored
+
+        Parameters:
+            url (str): url of link
+            depth (int): depth of the link from the start of the crawl
+            same_domain (bool): (default=True) if the link stays within the
+                crawled domain
+            anchor_text (str): (default="") text of the link's anchor element
+
+        Returns:
+            bool: True if the link was queued, otherwise False
+        """
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+
+        priority = self._get_priority(depth, same_domain, anchor_text)
+
+        # the counter keeps links of equal priority in the order found
+        heapq.heappush(self._heap, (priority, self._counter, url, depth))
+        self._counter += 1
+
+        return True
+
+    def pop(self):
+        """Remove and return the highest priority link
+
+        Returns:
+            tuple (str, int): url and depth of the link
+        """
+        _, _, url, depth = heapq.heappop(self._heap)
+        return url, depth
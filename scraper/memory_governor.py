@@ -0,0 +1,95 @@
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+__all__ = [
+    "peak_rss",
+    "MemoryGovernor"
+]
+
+def peak_rss():
+    """Get the peak resident memory of this process
+
+    Returns:
+        int or None: peak resident memory in bytes, None if unavailable
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # linux reports kilobytes, macos reports bytes
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+class MemoryGovernor:
+    """Watches the resident memory of the process against a budget so a crawl
+    can back off before it grows past it
+
+    Attributes:
+        max_memory (int): memory budget in bytes
+    """
+
+    # fraction of the budget at which batches start to shrink
+    SHRINK_LEVEL = 0.75
+    # fraction of the budget at which new fetches are paused
+    PAUSE_LEVEL = 0.9
+    # smallest fraction batches are shrunk to
+    MIN_BATCH_SCALE = 0.1
+
+    def __init__(self, max_memory):
+        self.max_memory = max_memory
+
+    def rss(self):
+        """Get the current resident memory of this process, falls back to the
+        peak resident memory where the current value can not be read
+
+        Returns:
+            int: resident memory in bytes
+        """
+        try:
+            with open("/proc/self/statm", "r") as statm:
+                resident_pages = int(statm.read().split()[1])
+            return resident_pages * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return peak_rss() or 0
+
+    def pressure(self):
+        """Get how much of the budget is in use
+
+        Returns:
+            float: resident memory as a fraction of the budget
+        """
+        return self.rss() / self.max_memory
+
+    def should_pause(self):
+        """Returns if resident memory is close enough to the budget that no
+        new work should be started
+
+        Returns:
+            bool: True if new work should wait, otherwise False
+        """
+        return self.pressure() >= self.PAUSE_LEVEL
+
+    def scale_batch(self, batch_size):
+        """Shrink a batch size as resident memory nears the budget
+
+        Parameters:
+            batch_size (int): batch size when there is no memory pressure
+
+        Returns:
+            int: batch size to use, at least 1
+        """
+        pressure = self.pressure()
+        if pressure <= self.SHRINK_LEVEL:
+            return batch_size
+
+        scale = (1.0 - pressure) / (1.0 - self.SHRINK_LEVEL)
+        scale = max(scale, self.MIN_BATCH_SCALE)
+
+        return max(int(batch_size * scale), 1)
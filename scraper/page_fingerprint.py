@@ -0,0 +1,116 @@
+import hashlib
+
+from collections import Counter, deque
+
+__all__ = [
+    "simhash",
+    "NearDuplicateIndex"
+]
+
+FINGERPRINT_BITS = 64
+
+def _feature_hash(feature):
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+def simhash(elements, shingle_size=3):
+    """Get the SimHash fingerprint of a page's text, pages with similar text
+    get fingerprints that differ in only a few bits
+
+    Parameters:
+        elements (list(str)): text elements of the page
+        shingle_size (int): (default=3) number of words in each feature
+
+    Returns:
+        int or None: 64 bit fingerprint, None if the page has no words
+    """
+    words = " ".join(elements).lower().split()
+    if len(words) == 0:
+        return None
+
+    # short pages still get a feature from what words they do have
+    span = min(shingle_size, len(words))
+    features = Counter(
+        " ".join(words[i:i+span]) for i in range(0, len(words) - span + 1)
+    )
+
+    weights = [0] * FINGERPRINT_BITS
+    for feature, weight in features.items():
+        feature_hash = _feature_hash(feature)
+
+        for bit in range(FINGERPRINT_BITS):
+            if feature_hash >> bit & 1:
+                weights[bit] += weight
+            else:
+                weights[bit] -= weight
+
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+
+    return fingerprint
+
+class NearDuplicateIndex:
+    """Remembers the fingerprints of recently processed pages so pages that are
+    nearly the same as one already seen can be skipped, and counts the work
+    skipping them saved
+
+    Attributes:
+        threshold (int): (default=3) most bits two fingerprints can differ by
+            and still be considered near duplicates
+        max_fingerprints (int): (default=4096) number of fingerprints to
+            remember, the oldest are forgotten first
+    """
+
+    def __init__(self, threshold=3, max_fingerprints=4096):
+        self.threshold = threshold
+        self._fingerprints = deque(maxlen=max_fingerprints)
+
+        self.pages_checked = 0
+        self.pages_skipped = 0
+        self.elements_skipped = 0
+        self.bytes_skipped = 0
+
+    def _is_near(self, fingerprint):
+        for seen in self._fingerprints:
+            if bin(fingerprint ^ seen).count("1") <= self.threshold:
+                return True
+        return False
+
+    def check(self, fingerprint, elements=0, size=0):
+        """Check a page against the pages seen so far, remembering it if it
+        is not a near duplicate
+
+        Parameters:
+            fingerprint (int or None): SimHash fingerprint of the page, pages
+                without one are never duplicates
+            elements (int): (default=0) number of text elements on the page
+            size (int): (default=0) size of the page body in bytes
+
+        Returns:
+            bool: True if the page is a near duplicate and can be skipped
+        """
+        self.pages_checked += 1
+
+        if fingerprint is None:
+            return False
+
+        if self._is_near(fingerprint):
+            self.pages_skipped += 1
+            self.elements_skipped += elements
+            self.bytes_skipped += size
+            return True
+
+        self._fingerprints.append(fingerprint)
+        return False
+
+    def summary(self):
+        """Get a short description of the work avoided
+
+        Returns:
+            str: summary of skipped pages
+        """
+        return "skipped {} of {} pages as near duplicates ({} text elements, {} bytes)".format(
+            self.pages_skipped, self.pages_checked, self.elements_skipped, self.bytes_skipped
+        )
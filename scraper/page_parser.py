@@ -0,0 +1,205 @@
+from collections import namedtuple
+from urllib.parse import urljoin, urldefrag, urlsplit
+
+from scraper.page_fingerprint import simhash
+
+__all__ = [
+    "ScrapedPage",
+    "PageParser"
+]
+
+# compact result of fetching a single page
+#   url (str): url of the page
+#   depth (int): depth of the page from the start of the crawl
+#   elements (list(str)): text elements of the page
+#   links (list(tuple(str, str))): links on the page paired with anchor text
+#   size (int): size of the page body in bytes
+#   fingerprint (int): SimHash of the page text, None if not computed
+ScrapedPage = namedtuple("ScrapedPage", [ "url", "depth", "elements", "links", "size", "fingerprint" ])
+
+class PageParser:
+    """Pulls the text elements and links out of page bodies. Holds no crawl
+    state, so it can be sent to worker processes to parse pages in parallel.
+
+    Attributes:
+        leave_domain (bool): (default=False) keep links outside of the domain
+            of the page they are found on
+        fingerprint (bool): (default=False) compute a SimHash fingerprint of
+            the text of each page
+    """
+
+    def __init__(self, leave_domain=False, fingerprint=False):
+        self.leave_domain = leave_domain
+        self.fingerprint = fingerprint
+
+    def _parse_page_content(self, text):
+        """Parse the text of a page
+
+        Parameters:
+            text (str): text of the page body
+
+        Returns:
+            BeautifulSoup: a parsed BeautifulSoup page object
+        """
+        # bs4 is slow to import, only load it once needed
+        from bs4 import BeautifulSoup as bsoup
+
+        return bsoup(text, 'html.parser')
+
+    def _get_word_elements(self, page_content, offset=0, amount=100):
+        """Get a given number text elements from a given offset
+
+        Parameters:
+            page_content (BeautifulSoup): soup object with page content to parse
+            offset (int): (default=0) offset from which to read words from
+            amount (int): (default=100) number of text element to grab, note: 
+                these are not WORDS, but entire ELEMENTS, so a whole 
+                <p></p> element will be returned, None grabs all of them
+
+        Returns:
+            list (str): a list of text elements, stripped from their containers
+        """
+
+        def get_element_string(element):
+            return " ".join(element.stripped_strings)
+
+        # this feels kinda :thonk:
+        text_element_tags = [
+            'p', 'h1', 'h2', 'h3', 
+            'h4', 'h5', 'h6', 'a',
+            'li', 'th', 'td'
+        ]
+
+        tag_position = 0
+        tag_queue = []
+        for tag in text_element_tags:
+            # get all text elements at current tag
+            tags = page_content.find_all(tag)
+            # filter only for those with inner text
+            tags = [ get_element_string(tag) for tag in tags if tag.string != "" ]
+            tags_size = len(tags)
+
+            # if out offset is within the range of out current set of tags, 
+            # add the amount needed to the queue
+            if offset >= tag_position and offset < tag_position + tags_size:
+                collection_offset = offset - (tag_position)
+                collection_cap = None if amount is None else collection_offset + amount
+
+                # this will read from the offset up to max the amount wanted
+                tag_queue.extend(
+                    tags[collection_offset : collection_cap]
+                )
+
+                # if we still need more tags, offset the offset so it will
+                # still read in more at the next round
+                tag_queue_size = len(tag_queue) 
+                if amount is None or tag_queue_size < amount:
+                    offset = tag_position + tags_size
+                else:
+                    return tag_queue
+            
+            tag_position += tags_size
+
+        return tag_queue
+
+    def is_in_domain(self, parent, child):
+        """Returns if a given child url is within the same domain as the parent
+
+        Parameters:
+            parent (str): url of parent domain
+            child (str): url of child domain to test
+
+        Returns:
+            bool: True if inside domain, otherwise False
+        """
+        
+        def get_domain(url):
+            domain = urlsplit(url).hostname or ""
+            if domain.startswith("www."):
+                return domain[4:]
+            return domain
+
+        return get_domain(parent) == get_domain(child)
+
+    def _fix_url(self, parent, child):
+        """If a given url is a sub url of a parent page, append to parent and 
+        return
+
+        Paremeters:
+            parent (str): parent url to append to, if necessary
+            child (str): child domain to fix in context of parent
+        """
+
+        # resolve relative links against the parent and drop any fragment
+        url, _ = urldefrag(urljoin(parent, child))
+        return url
+
+    def _get_page_links(self, parent_url, page_content, leave_domain=False):
+        """Grabs the links from a given page, filtering based on parameters
+
+        Paramters:
+            parent_url (str): url of the parent page, used for domain encapsulation
+                checks
+            page_content (BeautifulSoup): a BeautifulSoup object with the page 
+                content
+            leave_domain (bool): (default=False) set to true if you wish to grab
+                links outside of the current top level domain
+
+        Returns:
+            list (tuple(str, str)): link urls paired with their anchor text
+        """
+        a_elements = page_content.find_all('a')
+
+        def is_id_link(element):
+            return element.startswith("#")
+
+        # grab links from a elements
+        links = [
+            (element["href"], element.get_text(" ", strip=True)) 
+            for element in a_elements if element.get("href") 
+        ]
+
+        # remove id links and fix sub-links
+        links = [ 
+            (self._fix_url(parent_url, link), anchor) 
+            for link, anchor in links if not is_id_link(link) 
+        ]
+
+        # remove links not in domain if chosen
+        if not leave_domain:
+            links = [ 
+                (link, anchor) for link, anchor in links 
+                if self.is_in_domain(parent_url, link) 
+            ]
+
+        return links
+
+    def parse_page(self, url, depth, text, size, read_links):
+        """Parse a page and pull out its text elements, and its links if asked
+        to. Runs on a worker thread or process, so it does not touch any crawl 
+        state.
+
+        Parameters:
+            url (str): url of the page
+            depth (int): depth of the page from the start of the crawl
+            text (str): text of the page body
+            size (int): size of the page body in bytes
+            read_links (bool): if the links on the page should be read
+
+        Returns:
+            ScrapedPage: the text elements and links of the page
+        """
+        content = self._parse_page_content(text)
+
+        elements = self._get_word_elements(content, offset=0, amount=None)
+
+        # reading links is actually vaugely expensive, only do it if needed
+        links = []
+        if read_links:
+            links = self._get_page_links(url, content, leave_domain=self.leave_domain)
+
+        fingerprint = None
+        if self.fingerprint:
+            fingerprint = simhash(elements)
+
+        return ScrapedPage(url, depth, elements, links, size, fingerprint)
@@ -0,0 +1,201 @@
+import gzip
+
+from contextlib import closing
+from urllib.parse import urljoin, urlsplit
+from xml.etree.ElementTree import iterparse, ParseError
+
+__all__ = [
+    "get_robots_sitemaps",
+    "discover_sitemap_urls"
+]
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+class _PrefixedStream:
+    """Binary stream that reads back bytes already taken from the front of
+    another stream before reading the rest of it
+    """
+
+    def __init__(self, prefix, stream):
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._prefix + self._stream.read()
+            self._prefix = b""
+            return data
+
+        if self._prefix:
+            data = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+            return data
+
+        return self._stream.read(size)
+
+    def close(self):
+        self._stream.close()
+
+def _open_stream(url, user_agent, timeout=None):
+    """Open a streaming request to a url, returning a binary file-like object
+    of the decompressed body, or None if the request fails
+    """
+    # requests is slow to import, only load it once needed
+    import requests
+    from urllib3.exceptions import HTTPError
+
+    try:
+        r = requests.get(url, headers={ 'user-agent' : user_agent }, stream=True, timeout=timeout)
+    except requests.RequestException:
+        return None
+
+    if r.status_code != 200:
+        r.close()
+        return None
+
+    # undo any content encoding, then any gzip applied to the file itself
+    r.raw.decode_content = True
+    try:
+        magic = r.raw.read(len(GZIP_MAGIC))
+    except (OSError, EOFError, HTTPError):
+        r.close()
+        return None
+
+    stream = _PrefixedStream(magic, r.raw)
+
+    if magic == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream)
+
+    return stream
+
+def get_robots_sitemaps(base_url, user_agent="python-requests", timeout=None):
+    """Get the sitemaps listed in a site's robots.txt
+
+    Parameters:
+        base_url (str): url of any page on the site
+        user_agent (str): (default="python-requests") user agent to use in
+            requests
+        timeout (float or tuple(float, float)): (default=None) connect and 
+            read timeouts of requests, None waits forever
+
+    Returns:
+        list (str): urls of the sitemaps listed
+    """
+    from urllib3.exceptions import HTTPError
+
+    stream = _open_stream(urljoin(base_url, "/robots.txt"), user_agent, timeout=timeout)
+    if stream is None:
+        return []
+
+    with closing(stream):
+        try:
+            lines = stream.read().splitlines()
+        except (OSError, EOFError, HTTPError):
+            # a robots.txt that breaks off lists no sitemaps
+            return []
+
+    sitemaps = []
+    for line in lines:
+        line = line.decode("utf-8", errors="replace").strip()
+
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "sitemap" and value.strip() != "":
+            sitemaps.append(value.strip())
+
+    return sitemaps
+
+def _local_name(tag):
+    # strip the xml namespace from a tag name
+    return tag.rsplit("}", 1)[-1]
+
+def _parse_sitemap(stream):
+    """Incrementally parse a sitemap, yielding its entries without holding the
+    whole document in memory
+
+    Returns:
+        generator (tuple(str, str)): entry kind, "url" for a page or "sitemap"
+            for a nested sitemap in a sitemap index, and the entry location
+    """
+    root = None
+    location = None
+
+    for event, element in iterparse(stream, events=("start", "end")):
+        if root is None:
+            root = element
+
+        if event != "end":
+            continue
+
+        name = _local_name(element.tag)
+
+        if name == "loc":
+            location = (element.text or "").strip()
+        elif name in ("url", "sitemap"):
+            if location:
+                yield name, location
+            location = None
+
+            # drop finished entries so memory does not grow with the sitemap
+            root.clear()
+
+def discover_sitemap_urls(base_url, user_agent="python-requests", max_urls=None, max_sitemaps=50, timeout=None,
+    accept=None):
+    """Find the pages of a site from its sitemaps, starting with the sitemaps
+    listed in robots.txt and falling back to /sitemap.xml. Sitemap indexes
+    are followed and gzipped sitemaps are decompressed as they are read.
+
+    Parameters:
+        base_url (str): url of any page on the site
+        user_agent (str): (default="python-requests") user agent to use in
+            requests
+        max_urls (int): (default=None) stop after finding this many pages
+        max_sitemaps (int): (default=50) most sitemaps to read
+        timeout (float or tuple(float, float)): (default=None) connect and 
+            read timeouts of requests, None waits forever
+        accept (function): (default=None) takes a page url and returns if it 
+            is wanted, pages it refuses are skipped and not counted towards
+            max_urls, None accepts every page
+
+    Returns:
+        generator (str): urls of pages on the site
+    """
+    from urllib3.exceptions import HTTPError
+
+    sitemaps = get_robots_sitemaps(base_url, user_agent=user_agent, timeout=timeout)
+    if len(sitemaps) == 0:
+        sitemaps = [ urljoin(base_url, "/sitemap.xml") ]
+
+    seen_sitemaps = set()
+    found = 0
+
+    while len(sitemaps) > 0 and len(seen_sitemaps) < max_sitemaps:
+        sitemap = sitemaps.pop(0)
+        if sitemap in seen_sitemaps:
+            continue
+        seen_sitemaps.add(sitemap)
+
+        stream = _open_stream(sitemap, user_agent, timeout=timeout)
+        if stream is None:
+            continue
+
+        with closing(stream):
+            try:
+                for kind, location in _parse_sitemap(stream):
+                    if kind == "sitemap":
+                        sitemaps.append(location)
+                        continue
+
+                    if urlsplit(location).scheme not in ("http", "https"):
+                        continue
+
+                    if accept is not None and not accept(location):
+                        continue
+
+                    yield location
+
+                    found += 1
+                    if max_urls is not None and found >= max_urls:
+                        return
+            except (ParseError, OSError, EOFError, HTTPError):
+                # a broken sitemap still gives the entries read before it broke
+                continue
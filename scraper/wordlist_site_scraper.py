@@ -1,14 +1,64 @@
-import requests
+import asyncio
+import codecs
+import random
 import re
-
-from bs4 import BeautifulSoup as bsoup
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from hashlib import blake2b
+from posixpath import splitext
+from urllib.parse import urlsplit
+
+from scraper.crawl_frontier import CrawlBudget, CrawlFrontier
+from scraper.page_fingerprint import NearDuplicateIndex
+from scraper.page_parser import ScrapedPage, PageParser
+from scraper.block_cache import BlockCache
+from scraper.circuit_breaker import CircuitBreaker
+from corpus.crawl_state import PageState
+from scraper.sitemap import discover_sitemap_urls
+from wordlist.wordlist_processor import truncate_candidates
+
+__all__ = [
+    "PageResponse",
+    "ScrapeError",
+    "ScrapedPage",
+    "WordListSiteScraper"
+]
+
+# result of requesting a single page
+#   text (str): text of the page body, None if the page was skipped or not
+#       modified
+#   size (int): number of bytes transferred
+#   etag (str): etag validator of the response, None if not given
+#   last_modified (str): last-modified validator of the response, None if not
+#       given
+#   content_hash (str): hash of the page body, None if there is no body
+#   not_modified (bool): if the server said the page has not changed since
+#       the validators sent
+PageResponse = namedtuple("PageResponse", [ 
+    "text", "size", "etag", "last_modified", "content_hash", "not_modified" 
+])
+
+class ScrapeError(Exception):
+    """Raised when the start url, or a page on a host that has never 
+    answered, cannot be reached and unresponsive sites are not being skipped
+    """
 
 class WordListSiteScraper:
-    """Scapes a given website for text and links
+    """Scapes a given website for text and links. Creating a scraper does not
+    start a crawl, candidates are read from the candidate_batches async 
+    generator, which only fetches pages as fast as the batches are consumed.
+
+    A crawl runs as a pipeline of fetch, parse and chain stages linked by 
+    bounded queues, so a slow stage pauses the stages before it instead of
+    letting work pile up in memory.
 
     Attributes:
         url (str): url of website to scrape
-        wordlist_processor (WordListProcessor): buffer for writing scaped lines
+        wordlist_processor (WordListProcessor or ProfileFanOut): processor
+            used to generate candidates from scraped text, a ProfileFanOut
+            generates candidates for several profiles at once
         depth (int): (default=0) depth of links to read from, 0 reads only
             from current page
         leave_domain (bool): (default=False) if depth is greater than 0, choose
@@ -17,10 +67,87 @@ class WordListSiteScraper:
             memory before processing and writing to disk
         skip_on_no_connect (bool): (default=False) instead of raising an error
             on no site connect, instead ignore the site and move to the next one
+        user_agent (str): (default="python-requests") user agent to use in
+            requests
+        max_pages (int): (default=None) stop after fetching this many pages
+        max_bytes (int): (default=None) stop after downloading this many bytes
+        max_time (float): (default=None) stop after crawling for this many
+            seconds
+        max_candidates (int): (default=None) stop after generating this many
+            candidates
+        candidate_budget (CandidateBudget): (default=None) budget of 
+            candidates for each profile, used instead of max_candidates, the
+            crawl stops once every profile has reached its limit
+        concurrency (int): (default=4) number of pages to fetch at once
+        near_duplicate_threshold (int): (default=None) skip generating from 
+            pages whose SimHash differs from an already processed page by at
+            most this many bits, None disables the check
+        block_cache (bool): (default=True) only process text elements that 
+            repeat across pages, like navigation and footers, the first time
+            they are seen
+        memory_governor (MemoryGovernor): (default=None) governor watching a
+            memory budget, as memory nears the budget fetches are paused and
+            batches are shrunk
+        queue_size (int): (default=8) number of candidate batches that can
+            wait to be consumed
+        use_sitemap (bool): (default=False) queue every page listed in the
+            site's sitemaps at the start of the crawl, links are then only
+            followed if no sitemap is found
+        max_page_size (int): (default=5242880) largest page body in bytes to 
+            download, larger pages are abandoned part way through
+        parse_workers (int): (default=0) number of worker processes to parse
+            pages in, 0 parses pages on the fetch threads, as many pages are
+            parsed at once as there are workers or fetch threads
+        corpus_store (CorpusStore): (default=None) store to save the text 
+            elements of every parsed page to
+        connect_timeout (float): (default=5.0) seconds to wait for a 
+            connection to a host
+        read_timeout (float): (default=15.0) seconds to wait for each read
+            from a host
+        page_timeout (float): (default=60.0) seconds a page body can take to
+            download before it is abandoned
+        retries (int): (default=2) number of times to retry a request that
+            failed to connect, timed out or got a server error response
+        circuit_breaker (CircuitBreaker): (default=None) breaker deciding which
+            hosts to skip after repeated failures, one is created if None
+        crawl_state (CrawlState): (default=None) state kept from earlier 
+            crawls, pages that have not changed since are not parsed or 
+            generated from again, their stored links are followed instead
     """
 
+    # extensions of links that are never worth downloading for their text
+    SKIPPED_EXTENSIONS = {
+        ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".svg", ".ico", ".tif", ".tiff",
+        ".mp3", ".wav", ".ogg", ".flac", ".m4a",
+        ".mp4", ".mkv", ".webm", ".avi", ".mov", ".wmv", ".flv",
+        ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+        ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".tar",
+        ".exe", ".msi", ".dmg", ".iso", ".apk", ".bin",
+        ".css", ".js", ".woff", ".woff2", ".ttf", ".otf", ".eot"
+    }
+
+    # content types that are parsed, responses without a content type are
+    # parsed as well
+    ACCEPTED_CONTENT_TYPES = { "text/html", "application/xhtml+xml", "text/plain" }
+
+    # size of the pieces page bodies are downloaded in
+    DOWNLOAD_CHUNK_SIZE = 16384
+
+    # response statuses worth retrying, the server may answer given time
+    RETRY_STATUSES = { 429, 500, 502, 503, 504 }
+
+    # first retry delay in seconds, doubled for each retry up to the cap
+    RETRY_BACKOFF = 0.5
+    RETRY_BACKOFF_CAP = 8.0
+
     def __init__(self, url, wordlist_processor, depth=0, leave_domain=False, 
-        bank_size=100, skip_on_no_connect=False, user_agent="python-requests"):
+        bank_size=100, skip_on_no_connect=False, user_agent="python-requests",
+        max_pages=None, max_bytes=None, max_time=None, max_candidates=None,
+        concurrency=4, near_duplicate_threshold=None, block_cache=True,
+        memory_governor=None, queue_size=8, use_sitemap=False, 
+        max_page_size=5 * 1024 * 1024, parse_workers=0, corpus_store=None,
+        connect_timeout=5.0, read_timeout=15.0, page_timeout=60.0, retries=2,
+        circuit_breaker=None, crawl_state=None, candidate_budget=None):
         self.url = url
         self._wl_processor = wordlist_processor
         self._depth = depth
@@ -28,219 +155,708 @@ class WordListSiteScraper:
         self._bank_size = bank_size
         self._skip_unresponsive = skip_on_no_connect
         self._user_agent = user_agent
+        self._concurrency = max(concurrency, 1)
+        self._memory = memory_governor
+        self._queue_size = max(queue_size, 1)
+        self._use_sitemap = use_sitemap
+        self._max_page_size = max_page_size
+        self._parse_workers = parse_workers
+        self._corpus = corpus_store
+        self._connect_timeout = connect_timeout
+        self._read_timeout = read_timeout
+        self._page_timeout = page_timeout
+        self._retries = max(retries, 0)
+
+        # looking for a brotli decoder is an import search, so it is only
+        # done once
+        self._accept_encoding = self._get_accept_encoding()
+
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker(slow_threshold=read_timeout)
+        self.circuit_breaker = circuit_breaker
+
+        self._state = crawl_state
+        self.unchanged_pages = 0
+
+        # hosts that have sent a response, a page on one that cannot be
+        # reached is skipped rather than ending the crawl
+        self._answered_hosts = set()
+
+        self.near_duplicates = None
+        if near_duplicate_threshold is not None:
+            self.near_duplicates = NearDuplicateIndex(threshold=near_duplicate_threshold)
+
+        self.block_cache = BlockCache() if block_cache else None
+
+        self._parser = PageParser(
+            leave_domain=leave_domain,
+            fingerprint=self.near_duplicates is not None
+        )
 
-        self._scrape_page(
-            url, 
-            wordlist_processor, 
-            depth=depth, 
-            buffer_size=bank_size, 
-            skip_unresponsive=skip_on_no_connect,
-            user_agent=user_agent
+        self.budget = CrawlBudget(
+            max_pages=max_pages,
+            max_bytes=max_bytes,
+            max_time=max_time,
+            max_candidates=max_candidates,
+            candidate_budget=candidate_budget
         )
 
-    def _get_page_content(self, url, user_agent="python-requests"):
-        """Grabs the page content at a given url, raises an exception on 
-        load error
+    def _format_url(self, url):
+        """Give a url a protocol if it is missing one
 
         Parameters:
-            url (str): url to website 
-            user_agent (str): user agent to use in requests
+            url (str): url to format
 
         Returns:
-            BeautifulSoup: a parsed BeautifulSoup page object
+            str: url with protocol
         """
+        has_http_header = re.search("((http)s*(://))", url)
+        if not has_http_header:
+            return "http://" + url
+        return url 
 
-        def format_url(url):
-            has_http_header = re.search("((http)s*(://))", url)
-            if not has_http_header:
-                return "http://" + url
-            return url 
+    def _is_page_url(self, url):
+        """Returns if a url might be a page worth downloading, judged by the
+        extension of its path
 
-        try:
-            headers = {
-                'user-agent' : user_agent
-            }
+        Parameters:
+            url (str): url to test
+
+        Returns:
+            bool: False if the url points at a known non page resource
+        """
+        _, extension = splitext(urlsplit(url).path)
+        return extension.lower() not in self.SKIPPED_EXTENSIONS
+
+    def _get_accept_encoding(self):
+        """Get the transfer encodings to ask for, brotli is only asked for when
+        a decoder for it is installed
+
+        Returns:
+            str: value for the accept-encoding header
+        """
+        encodings = [ "gzip", "deflate" ]
 
-            r = requests.get(format_url(url), headers=headers)
-        except:
-            raise Exception("Unable to connect to given url '{}'".format(url))
+        try:
+            import brotli
+            encodings.append("br")
+        except ImportError:
+            pass
 
-        return bsoup(r.text, 'html.parser')
+        return ", ".join(encodings)
 
-    def _get_word_elements(self, page_content, offset=0, amount=100):
-        """Get a given number text elements from a given offset
+    def _get_backoff(self, attempt, retry_after=None):
+        """Get the seconds to wait before retrying a request, an exponential
+        backoff with full jitter so retries to a host do not arrive together
 
         Parameters:
-            page_content (BeautifulSoup): soup object with page content to parse
-            offset (int): (default=0) offset from which to read words from
-            amount (int): (default=100) number of text element to grab, note: 
-                these are not WORDS, but entire ELEMENTS, so a whole 
-                <p></p> element will be returned 
+            attempt (int): number of the attempt that failed, starting at 0
+            retry_after (float): (default=None) delay asked for by the server,
+                waited for up to the backoff cap
 
         Returns:
-            list (str): a list of text elements, stripped from their containers
+            float: seconds to wait
         """
+        delay = random.uniform(0, min(self.RETRY_BACKOFF_CAP, self.RETRY_BACKOFF * 2 ** attempt))
 
-        def get_element_string(element):
-            return " ".join(element.stripped_strings)
-
-        # this feels kinda :thonk:
-        text_element_tags = [
-            'p', 'h1', 'h2', 'h3', 
-            'h4', 'h5', 'h6', 'a',
-            'li', 'th', 'td'
-        ]
-
-        tag_position = 0
-        tag_queue = []
-        for tag in text_element_tags:
-            # get all text elements at current tag
-            tags = page_content.find_all(tag)
-            # filter only for those with inner text
-            tags = [ get_element_string(tag) for tag in tags if tag.string != "" ]
-            tags_size = len(tags)
-
-            # if out offset is within the range of out current set of tags, 
-            # add the amount needed to the queue
-            if offset >= tag_position and offset < tag_position + tags_size:
-                collection_offset = offset - (tag_position)
-                collection_cap = collection_offset + amount
-
-                # this will read from the offset up to max the amount wanted
-                tag_queue.extend(
-                    tags[collection_offset : collection_cap]
-                )
-
-                # if we still need more tags, offset the offset so it will
-                # still read in more at the next round
-                tag_queue_size = len(tag_queue) 
-                if tag_queue_size < amount:
-                    offset += tag_queue_size
-                else:
-                    return tag_queue
-            
-            tag_position += tags_size
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.RETRY_BACKOFF_CAP))
 
-        return tag_queue
+        return delay
 
-    def _is_in_domain(self, parent, child):
-        """Returns if a given child url is within the same domain as the parent
+    def _get_retry_after(self, response):
+        """Get the delay in seconds a response asks for before a retry, or 
+        None if it does not give one in seconds
+        """
+        if response is None:
+            return None
+
+        retry_after = response.headers.get("retry-after", "").strip()
+        if retry_after.isdigit():
+            return float(retry_after)
+        return None
+
+    def _get_page_content(self, url, user_agent="python-requests", page_state=None):
+        """Grabs the page content at a given url. Requests that fail to 
+        connect, time out or get a server error are retried with a backoff, 
+        unless the host's circuit opens. A page that still cannot be fetched
+        is skipped, unless it is the start url or its host has never answered.
+        The
+        body is only downloaded if the response headers say it is a page, and
+        the download is abandoned if the body grows too large, takes too long
+        or turns out to be binary.
 
         Parameters:
-            parent (str): url of parent domain
-            child (str): url of child domain to test
+            url (str): url to website 
+            user_agent (str): user agent to use in requests
+            page_state (PageState): (default=None) state of the page from an
+                earlier crawl, its validators are sent so the server can 
+                answer that the page has not changed
 
         Returns:
-            bool: True if inside domain, otherwise False
+            PageResponse: the result of the request
+
+        Raises:
+            ScrapeError: if the start url, or a page on a host that has never
+                answered, cannot be reached
         """
-        
-        def get_domain(url):
-            # grabs any url with structure "someproto://example.com"
-            regex_proto = re.search("^(.*[://])+", url)
-            if regex_proto:
-                url = url[regex_proto.end():]
-            return url.split("/")[0]
+        # requests is slow to import, only load it once needed
+        import requests
+
+        url = self._format_url(url)
+        host = urlsplit(url).hostname or ""
+
+        headers = {
+            'user-agent' : user_agent,
+            'accept' : "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.1",
+            'accept-encoding' : self._accept_encoding
+        }
+
+        if page_state is not None:
+            if page_state.etag is not None:
+                headers['if-none-match'] = page_state.etag
+            if page_state.last_modified is not None:
+                headers['if-modified-since'] = page_state.last_modified
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+
+            try:
+                response = self._fetch_page(url, headers)
+            except requests.RequestException as e:
+                self.circuit_breaker.record_failure(host)
+
+                if attempt < self._retries and not self.circuit_breaker.is_open(host):
+                    time.sleep(self._get_backoff(attempt, self._get_retry_after(e.response)))
+                    attempt += 1
+                    continue
+
+                # the host answered but kept erroring or breaking off the
+                # body, only the page is lost
+                if e.response is not None:
+                    self._answered_hosts.add(host)
+                    return PageResponse(None, 0, None, None, None, False)
+
+                # a host that answered before is up, so a page that times out
+                # or cannot connect is skipped, the breaker decides when the
+                # host is given up on
+                if host in self._answered_hosts and url != self._format_url(self.url):
+                    return PageResponse(None, 0, None, None, None, False)
 
-        def get_top_domain(url):
-            return url.split(".")[0:1]
+                raise ScrapeError("Unable to connect to url {}".format(url))
 
-        return get_top_domain(parent) == get_top_domain(child)
+            self._answered_hosts.add(host)
+            self.circuit_breaker.record_success(host, time.monotonic() - started)
 
-    def _fix_url(self, parent, child):
-        """If a given url is a sub url of a parent page, append to parent and 
-        return
+            return response
 
-        Paremeters:
-            parent (str): parent url to append to, if necessary
-            child (str): child domain to fix in context of parent
+    def _fetch_page(self, url, headers):
+        """Make a single request for a page, see _get_page_content
+
+        Returns:
+            PageResponse: the result of the request
+
+        Raises:
+            requests.RequestException: if the request fails, responses with a
+                status worth retrying, and bodies that break off or time out
+                part way, raise an error holding the response
         """
+        import requests
+
+        started = time.monotonic()
+
+        r = requests.get(
+            url, 
+            headers=headers, 
+            stream=True, 
+            timeout=(self._connect_timeout, self._read_timeout)
+        )
 
-        if child.startswith("/"):
-            return parent + child
-        return child
+        if r.status_code in self.RETRY_STATUSES:
+            r.close()
+            raise requests.HTTPError("Server error {}".format(r.status_code), response=r)
+
+        etag = r.headers.get("etag")
+        last_modified = r.headers.get("last-modified")
+
+        def transferred():
+            # bytes read off the wire, before decompression
+            try:
+                return r.raw.tell()
+            except (AttributeError, OSError):
+                return 0
+
+        def skipped(size=0):
+            return PageResponse(None, size, etag, last_modified, None, False)
+
+        with r:
+            if r.status_code == 304:
+                return PageResponse(None, 0, etag, last_modified, None, True)
+
+            content_type = r.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in self.ACCEPTED_CONTENT_TYPES:
+                return skipped()
+
+            content_length = r.headers.get("content-length", "")
+            if content_length.isdigit() and int(content_length) > self._max_page_size:
+                return skipped()
+
+            body = bytearray()
+            try:
+                for chunk in r.iter_content(chunk_size=self.DOWNLOAD_CHUNK_SIZE):
+                    # null bytes near the start mean a binary file
+                    if len(body) == 0 and b"\x00" in chunk[:1024]:
+                        return skipped(transferred())
+
+                    body += chunk
+                    if len(body) > self._max_page_size:
+                        return skipped(transferred())
+
+                    # a server trickling out a body never hits the read 
+                    # timeout
+                    if self._page_timeout is not None and time.monotonic() - started > self._page_timeout:
+                        return skipped(transferred())
+            except requests.RequestException as e:
+                # the host answered, so a broken body only loses the page
+                if e.response is None:
+                    e.response = r
+                raise
+
+            size = transferred() or len(body)
+
+        return PageResponse(
+            self._decode_body(body, r.encoding),
+            size,
+            etag,
+            last_modified,
+            blake2b(body, digest_size=16).hexdigest(),
+            False
+        )
 
-    def _get_page_links(self, parent_url, page_content, leave_domain=False):
-        """Grabs the links from a given page, filtering based on parameters
+    def _decode_body(self, body, encoding=None):
+        """Decode a page body, a charset python does not know is replaced by
+        one guessed from the body, as requests does for responses without one
+
+        Parameters:
+            body (bytes): page body
+            encoding (str): (default=None) charset of the response, None 
+                decodes as utf-8
 
-        Paramters:
-            parent_url (str): url of the parent page, used for domain encapsulation
-                checks
-            page_content (BeautifulSoup): a BeautifulSoup object with the page 
-                content
-            leave_domain (bool): (default=False) set to true if you wish to grab
-                links outside of the current top level domain
+        Returns:
+            str: text of the page, undecodable bytes are replaced
         """
-        a_elements = page_content.find_all('a')
+        if encoding is None:
+            encoding = "utf-8"
 
-        def is_id_link(element):
-            return element.startswith("#")
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            # the detector requests guesses charsets with, if one is installed
+            from requests.compat import chardet
 
-        # grab links from a elements
-        links = [ element["href"] for element in a_elements if element.get("href") ]
+            guessed = None
+            if chardet is not None:
+                guessed = chardet.detect(bytes(body))["encoding"]
 
-        # remove id links and fix sub-links
-        links = [ self._fix_url(parent_url, link) for link in links if not is_id_link(link) ]
+            encoding = guessed or "utf-8"
 
-        # remove links not in domain if chosen
-        if not leave_domain:
-            links = [ link for link in links if self._is_in_domain(parent_url, link) ]
+        return body.decode(encoding, errors="replace")
 
-        return links
-    
-    def _scrape_page(self, url, wordlist_buffer, depth=0, buffer_size=100, 
-        skip_unresponsive=False, user_agent="python-requests"):
-        """Scape a page at a given url for its content and links, reading out
-            to the given wordlist processor as it goes
+    def _get_sitemap_urls(self, url):
+        """Get the pages listed in the sitemaps of a site, limited by the page
+        budget and to the site's domain unless leaving it is allowed
 
         Parameters:
-            url (str): url of page to scrape content from
-            wordlist_buffer (WordListProcessor): a wordlist processor to read
-                out from as the scraper works through the page
-            depth (int): (default=0) how many levels deep to read from the page, 
-                if set to 0 then no link scraping is performed, otherwise links 
-                and scraped from the page and the scraped themselves recursively
-            buffer_size (int): (default=100) number of text elements to read 
-                from the page before passing them to the wordlist processor to 
-                be processed and written to the output location
-            skip_unresponsive (bool): (default=False) if a site is unresponsive,
-                skip scraping the site instead of throwing an exception
-            user_agent (str): user agent to use when making requests
+            url (str): url of the site
+
+        Returns:
+            list (str): urls of pages listed in the sitemaps
         """
-        try:
-            content = self._get_page_content(url, user_agent=user_agent)
-        except:
-            if skip_unresponsive:
+        def accept(sitemap_url):
+            if not self._is_page_url(sitemap_url):
+                return False
+            return self._leave_domain or self._parser.is_in_domain(url, sitemap_url)
+
+        # filtered as they are found, so skipped entries do not use up the
+        # page budget
+        return list(discover_sitemap_urls(
+            url, 
+            user_agent=self._user_agent, 
+            max_urls=self.budget.max_pages,
+            timeout=(self._connect_timeout, self._read_timeout),
+            accept=accept
+        ))
+
+    async def candidate_batches(self, decode=True, with_profile=False):
+        """Crawl outwards from the scraper's url, visiting pages in order of 
+        priority until there are no links left within the depth or the budget
+        is spent, yielding candidates for each batch of text elements. 
+        
+        Pages are fetched and parsed concurrently on worker threads, and no 
+        new fetches are started while the queues after them are full. 
+        Candidates are generated one batch at a time on a thread of their own,
+        so the event loop is never blocked. Closing or cancelling the 
+        generator stops the crawl.
+
+        Parameters:
+            decode (bool): (default=True) yield lists of candidate strings, if
+                False yield newline terminated blocks of encoded candidates
+            with_profile (bool): (default=False) yield each batch with the
+                index of the profile it was generated for, the index is always
+                0 unless the processor is a ProfileFanOut
+
+        Returns:
+            async generator (list(str) or bytearray, or tuple(int, batch)):
+                batches of candidates
+
+        Raises:
+            ScrapeError: if the start url, or a page on a host that has never
+                answered, cannot be reached and unresponsive sites are not 
+                being skipped
+        """
+        # links are resolved against the start url, so it needs a protocol
+        url = self._format_url(self.url)
+
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=self._concurrency)
+
+        # processors keep state between calls, so generating and the corpus
+        # and state writes that go with it run in order on a single thread
+        chain_executor = ThreadPoolExecutor(max_workers=1)
+
+        # parsing holds the gil, so it only scales past one core in processes
+        parse_executor = executor
+        if self._parse_workers > 0:
+            parse_executor = ProcessPoolExecutor(max_workers=self._parse_workers)
+
+        self.budget.start()
+
+        frontier = CrawlFrontier()
+
+        sitemap_urls = []
+        if self._use_sitemap:
+            sitemap_urls = await loop.run_in_executor(executor, self._get_sitemap_urls, url)
+
+        if len(sitemap_urls) > 0:
+            # the sitemap already lists the pages, so links are not followed
+            frontier.push(url, self._depth)
+            for sitemap_url in sitemap_urls:
+                frontier.push(sitemap_url, self._depth)
+        else:
+            frontier.push(url, 0)
+
+        # bounded queues between stages, a full queue pauses the stage before
+        # it, and None marks the end of the crawl
+        parse_queue = asyncio.Queue(maxsize=max(self._concurrency, self._parse_workers))
+        chain_queue = asyncio.Queue(maxsize=self._concurrency)
+        output_queue = asyncio.Queue(maxsize=self._queue_size)
+
+        # pages taken from the frontier that have not finished the pipeline,
+        # the crawl is over when there are none and the frontier is empty
+        in_flight = 0
+        page_finished = asyncio.Event()
+
+        def finish_page():
+            nonlocal in_flight
+            in_flight -= 1
+            page_finished.set()
+
+        def memory_paused():
+            # a page must be in flight for memory to be freed by waiting
+            return self._memory is not None and in_flight > 0 and self._memory.should_pause()
+
+        # state of pages waiting to be generated from, by url
+        pending_states = {}
+
+        def queue_links(page_depth, links):
+            for link, anchor in links:
+                if not self._is_page_url(link):
+                    continue
+
+                frontier.push(
+                    link,
+                    page_depth + 1,
+                    same_domain=self._parser.is_in_domain(url, link),
+                    anchor_text=anchor
+                )
+
+        # requests started that have not been recorded against the budget
+        fetching = 0
+
+        async def request_page(page_url, page_depth):
+            """Request a page, returns the response and the page's state from
+            an earlier crawl, or None if the page was not requested
+            """
+            # hosts that keep failing or stalling are not requested again
+            # until their cool down has passed
+            if not self.circuit_breaker.allow(urlsplit(self._format_url(page_url)).hostname or ""):
+                return None
+
+            page_state = None
+            if self._state is not None:
+                page_state = await loop.run_in_executor(executor, self._state.get_page, page_url)
+
+                # a page whose links are needed can only be skipped if they
+                # were stored when it was last processed
+                if page_state is not None and page_state.links is None and page_depth < self._depth:
+                    page_state = None
+
+            try:
+                response = await loop.run_in_executor(
+                    executor, self._get_page_content, page_url, self._user_agent, page_state)
+            except ScrapeError:
+                if self._skip_unresponsive:
+                    return None
+                raise
+
+            return response, page_state
+
+        async def fetch(page_url, page_depth):
+            nonlocal fetching
+
+            try:
+                requested = await request_page(page_url, page_depth)
+            finally:
+                fetching -= 1
+
+            if requested is None:
+                finish_page()
+                return
+
+            response, page_state = requested
+
+            if page_state is not None and (response.not_modified or 
+                response.content_hash == page_state.content_hash):
+                # an unchanged page gave all its candidates last time, only
+                # its links are still needed
+                self.budget.record_page(response.size)
+                self.unchanged_pages += 1
+
+                if page_depth < self._depth:
+                    queue_links(page_depth, page_state.links)
+
+                finish_page()
                 return
-            else:
-                print(
-                    "[error] Unable to connect to url {}, to ignore unresponsive urls use --ignore-unresponsive".format(url)
+
+            if response.text is None:
+                # not a page, only the bytes spent finding that out count
+                self.budget.record_bytes(response.size)
+                finish_page()
+                return
+
+            # recorded as soon as it is fetched, so the page limit is checked
+            # against pages fetched rather than pages generated from
+            self.budget.record_page(response.size)
+
+            await parse_queue.put((page_url, page_depth, response))
+
+        async def fetch_stage():
+            nonlocal in_flight, fetching
+            fetches = set()
+
+            def reap(done):
+                for task in done:
+                    fetches.discard(task)
+                    # raises the error of a failed fetch
+                    task.result()
+
+            try:
+                while not self.budget.exhausted(pending_pages=fetching):
+                    if len(frontier) == 0 or memory_paused():
+                        if in_flight == 0:
+                            break
+
+                        page_finished.clear()
+                        waiting = asyncio.ensure_future(page_finished.wait())
+                        done, _ = await asyncio.wait(
+                            fetches | { waiting }, return_when=asyncio.FIRST_COMPLETED)
+                        waiting.cancel()
+                        reap(done - { waiting })
+                        continue
+
+                    # fetch one page at a time while memory is under pressure
+                    fetch_limit = self._concurrency
+                    if self._memory is not None and self._memory.should_pause():
+                        fetch_limit = 1
+
+                    if len(fetches) >= fetch_limit:
+                        done, _ = await asyncio.wait(fetches, return_when=asyncio.FIRST_COMPLETED)
+                        reap(done)
+                        continue
+
+                    page_url, page_depth = frontier.pop()
+                    in_flight += 1
+                    fetching += 1
+                    fetches.add(asyncio.ensure_future(fetch(page_url, page_depth)))
+
+                while len(fetches) > 0:
+                    done, _ = await asyncio.wait(fetches, return_when=asyncio.FIRST_COMPLETED)
+                    reap(done)
+            finally:
+                for task in fetches:
+                    task.cancel()
+
+            await parse_queue.put(None)
+
+        async def parse_pages():
+            while True:
+                item = await parse_queue.get()
+                if item is None:
+                    # leave the end of the crawl for the other parse tasks
+                    await parse_queue.put(None)
+                    break
+
+                page_url, page_depth, response = item
+                read_links = page_depth < self._depth
+
+                page = await loop.run_in_executor(
+                    parse_executor, 
+                    self._parser.parse_page, 
+                    page_url, 
+                    page_depth, 
+                    response.text, 
+                    response.size, 
+                    read_links
                 )
-                exit(0)
-
-        # read words from the page until 
-        read_position = 0
-        words = self._get_word_elements(content, offset=0, amount=buffer_size)
-        while len(words) > 0:
-            # read the set of words to the wordlist buffer for processing
-            wordlist_buffer.process(words)
-
-            # offset read position with amount of words and read next set
-            read_position += len(words)
-            words = self._get_word_elements(content, offset=read_position, amount=buffer_size)
-
-        # only read links from page if the depth is greater than 0, this process
-        # is actually vaugely expensive 
-        if depth > 0:
-            links = self._get_page_links(url, content, leave_domain=self._leave_domain)
-
-            # recursive scrap links on pages
-            for link in links:
-                depth -= 1
-                self._scrape_page(
-                    link, 
-                    wordlist_buffer, 
-                    depth=depth, 
-                    buffer_size=buffer_size,
-                    skip_unresponsive=skip_unresponsive,
-                    user_agent=user_agent
-                )
\ No newline at end of file
+
+                queue_links(page.depth, page.links)
+
+                if self._state is not None:
+                    # recorded once the page has been fully generated from
+                    pending_states[page.url] = PageState(
+                        response.etag, 
+                        response.last_modified, 
+                        response.content_hash, 
+                        page.links if read_links else None
+                    )
+
+                await chain_queue.put(page)
+
+        async def parse_stage():
+            # a page is parsed by each task at once, so there are enough to
+            # keep every parse worker busy
+            parsers = [
+                asyncio.ensure_future(parse_pages())
+                for _ in range(max(self._parse_workers, self._concurrency))
+            ]
+
+            try:
+                await asyncio.gather(*parsers)
+            finally:
+                for parser in parsers:
+                    parser.cancel()
+
+            await chain_queue.put(None)
+
+        async def chain_stage():
+            while True:
+                page = await chain_queue.get()
+                if page is None:
+                    break
+
+                try:
+                    completed = await chain_page(page)
+
+                    # a page cut short by the budget is processed again on
+                    # the next crawl
+                    page_state = pending_states.pop(page.url, None)
+                    if page_state is not None and completed:
+                        await loop.run_in_executor(
+                            chain_executor, self._state.set_page, page.url, page_state)
+                finally:
+                    finish_page()
+
+            await output_queue.put(None)
+
+        async def chain_page(page):
+            """Generate candidates from a page, returns False if the budget
+            ran out before all of them were generated
+            """
+            # the corpus keeps every page, so it can be generated from again
+            # with any settings
+            if self._corpus is not None:
+                await loop.run_in_executor(
+                    chain_executor, self._corpus.add_page, page.url, page.elements)
+
+            # near duplicate pages still give links, but their text would 
+            # only repeat candidates already generated
+            if self.near_duplicates is not None and self.near_duplicates.check(
+                page.fingerprint, elements=len(page.elements), size=page.size):
+                return True
+
+            elements = page.elements
+            if self.block_cache is not None:
+                elements = self.block_cache.filter_new(elements)
+
+            i = 0
+            while i < len(elements):
+                if self.budget.generation_exhausted():
+                    return False
+
+                batch_size = self._bank_size
+                if self._memory is not None:
+                    batch_size = self._memory.scale_batch(batch_size)
+
+                blocks = await loop.run_in_executor(
+                    chain_executor, self._wl_processor.generate, elements[i:i+batch_size])
+                i += batch_size
+
+                # a fan out gives a block for each of its profiles
+                if isinstance(blocks, (bytes, bytearray)):
+                    blocks = [ blocks ]
+
+                completed = True
+                for profile, block in enumerate(blocks):
+                    # stop exactly on each profile's candidate limit
+                    amount = block.count(b"\n")
+                    allowed = self.budget.take_candidates(amount, profile)
+                    if allowed < amount:
+                        block = truncate_candidates(block, allowed)
+                        completed = False
+
+                    if block:
+                        await output_queue.put((profile, block))
+
+                if not completed:
+                    return False
+
+            return True
+
+        stages = asyncio.gather(fetch_stage(), parse_stage(), chain_stage())
+
+        try:
+            while True:
+                getting = asyncio.ensure_future(output_queue.get())
+                if not stages.done():
+                    await asyncio.wait({ getting, stages }, return_when=asyncio.FIRST_COMPLETED)
+
+                # raise the error of a failed stage
+                if stages.done() and stages.exception() is not None:
+                    getting.cancel()
+                    stages.result()
+
+                item = await getting
+                if item is None:
+                    break
+
+                profile, batch = item
+                if decode:
+                    batch = batch.decode("utf-8").split("\n")[:-1]
+
+                if with_profile:
+                    yield profile, batch
+                else:
+                    yield batch
+        finally:
+            def retrieve_error(future):
+                # errors after the consumer has stopped have nowhere to go
+                if not future.cancelled():
+                    future.exception()
+
+            stages.cancel()
+            stages.add_done_callback(retrieve_error)
+            executor.shutdown(wait=False)
+            chain_executor.shutdown(wait=False)
+            if parse_executor is not executor:
+                parse_executor.shutdown(wait=False)
@@ -115,12 +115,23 @@ class FilterMakeWordChains(Filter):
         max_length (int): (default=15) max word length to use, otherwise filter
     """
 
-    def filter_words(self, word_groups, **kwargs):
+    # encoding of the chains in the blocks built by encode_chains
+    ENCODING = "utf-8"
+
+    def __init__(self):
         self._charset = " _-+=.,;:"
         self._max_combo = 3
         self._min_length = 3
         self._max_length = 15
+        self._smush_words = True
 
+    def _read_options(self, kwargs):
+        """Read chain options out of the keyword arguments given to the filter,
+        raising an exception on invalid values
+
+        Parameters:
+            kwargs (dict): keyword arguments passed to the filter
+        """
         if "charset" in kwargs:
             self._charset = kwargs["charset"]
         if "max_combo" in kwargs:
@@ -137,33 +148,51 @@ class FilterMakeWordChains(Filter):
         if self._min_length <= 0:
             raise Exception("Min word length must be greater than 0, {} provided".format(self._min_length))
 
-        word_chains = []
+    def filter_words(self, word_groups, **kwargs):
+        block = self.encode_chains(word_groups, **kwargs)
+        word_chains = block.decode(self.ENCODING).split("\n")
+
+        # drop the empty string following the final newline
+        return word_chains[:-1]
+
+    def encode_chains(self, word_groups, **kwargs):
+        """Create the word chains for the given word groups as a single block
+        of newline terminated bytes, ready to be written to output
+
+        Parameters:
+            word_groups (list): list of strings to make chains from
+
+        Returns:
+            bytearray: newline terminated chains
+        """
+        self._read_options(kwargs)
+
+        glues = [ glue.encode(self.ENCODING) for glue in self._charset ]
+
+        block = bytearray()
 
         # iterate through all words and gather their respective word chains
         for word in word_groups:
-            word_chains.extend(
-                self._get_chains(
-                    word, 
-                    self._charset,
-                    self._max_combo,
-                    self._min_length,
-                    self._max_length
-                )
+            self._get_chains(
+                word,
+                glues,
+                self._max_combo,
+                self._min_length,
+                self._max_length,
+                block
             )
 
-        return word_chains
+        return block
 
-    def _get_chains(self, word, charset, max_combo, min_length, max_length):
-        """Get word chains from a set of words, a charset, and a maximum combo size
+    def _get_chains(self, word, glues, max_combo, min_length, max_length, block):
+        """Get word chains from a set of words, a charset, and a maximum combo
+        size, appending them to the given block
 
         Parameters:
             word (str): set of words delimeted by space
-            charset (str): charset to join words with
+            glues (list(bytes)): encoded charset to join words with
             max_combo (int): maximum combo of words to join together
-
-        Returns:
-            list (str): list of word chains
-
+            block (bytearray): buffer to append newline terminated chains to
         """
 
         def is_empty(string):
@@ -172,51 +201,40 @@ class FilterMakeWordChains(Filter):
             str_len = len(string)
             return str_len >= min_length and str_len <= max_length
 
-        tokens = word.split(" ")
-        # filter empty and word length
-        tokens = [ token for token in tokens if not is_empty(token) and is_correct_len(token) ]
-
-        # max combo length of 1 means just return single words
-        if max_combo == 1:
-            return tokens
+        # filter empty and word length, each token is encoded once and its
+        # bytes are joined into every chain it is part of
+        parts = [
+            token.encode(self.ENCODING) for token in word.split(" ") 
+            if not is_empty(token) and is_correct_len(token)
+        ]
 
-        chains = []
+        for part in parts:
+            block += part
+            block += b"\n"
 
-        for i in range(1, max_combo+1):
-            chains.extend(
-                self._get_lapped_chain(tokens, charset, i)
-            )
-
-        return chains
+        # max combo length of 1 means just return single words
+        for length in range(2, max_combo+1):
+            self._get_lapped_chain(parts, glues, length, block)
 
-    def _get_lapped_chain(self, tokens, charset, length):
-        """Creates a string chains from a set of tokens, a set of joiner characters,
-        and a length of chain
+    def _get_lapped_chain(self, parts, glues, length, block):
+        """Creates chains from a set of encoded tokens, a set of joiner
+        characters, and a length of chain, appending them to the given block
 
         Paramters:
-            tokens (list): list of strings to join
-            charset (str): charset of glue characters
+            parts (list(bytes)): encoded tokens to join
+            glues (list(bytes)): encoded glue characters
             length (int): length of chains to gather
-
-        Returns:
-            list (str): list of chains
+            block (bytearray): buffer to append newline terminated chains to
         """
 
-        if length == 1:
-            return tokens
-
-        chains = []
+        for i in range(0, len(parts) - length):
+            # window over the tokens in the current range
+            chain = parts[i:i+length]
 
-        for i in range(0, len(tokens) - length):
-            # grab tokens in the current range
-            chain = tokens[i:i+length]
-            
             if self._smush_words:
-                chains.append("".join(chain))
-            # iterate through the set of characters from the char set 
-            for glue in charset:
-                chains.append(
-                    glue.join(chain)
-                )
-        
-        return chains
+                block += b"".join(chain)
+                block += b"\n"
+            # iterate through the set of characters from the char set
+            for glue in glues:
+                block += glue.join(chain)
+                block += b"\n"
@@ -0,0 +1,64 @@
+__all__ = [
+    "ProfileFanOut"
+]
+
+class ProfileFanOut:
+    """Generates candidates for several processors, or profiles, from the
+    same word groups. Word groups are normalized once and the result is
+    chained by each profile with its own settings, so a single crawl can
+    produce several wordlists.
+
+    Attributes:
+        processors (list(WordListProcessor)): processors for each profile,
+            each with its own settings and output controller
+    """
+
+    def __init__(self, processors):
+        if len(processors) == 0:
+            raise Exception("At least one profile is required")
+
+        self.processors = processors
+
+    def __len__(self):
+        return len(self.processors)
+
+    @property
+    def outputs(self):
+        """list (OutputController): output controller of each profile"""
+        return [ processor.output for processor in self.processors ]
+
+    def generate(self, word_groups):
+        """Create passwords for every profile from the given word groups,
+        without writing them anywhere
+
+        Parameters:
+            word_groups (list): list of strings to be turned into passwords
+
+        Returns:
+            list (bytearray): newline terminated passwords of each profile, in
+                the order of the processors
+        """
+        # normalizing does not depend on the profile settings, so it is only
+        # done once for all of them
+        normalized = self.processors[0].normalize(word_groups)
+
+        return [ processor.chain(normalized) for processor in self.processors ]
+
+    def process(self, word_groups):
+        """Create passwords for every profile from the given word groups,
+        writing them to the output controller of each profile
+
+        Parameters:
+            word_groups (list): list of strings to be turned into passwords
+
+        Returns:
+            int: number of candidates written across all profiles
+        """
+        candidates = 0
+
+        for output, block in zip(self.outputs, self.generate(word_groups)):
+            if block:
+                output.write_bytes(block)
+            candidates += block.count(b"\n")
+
+        return candidates
@@ -0,0 +1,54 @@
+__all__ = [
+    "read_text_elements"
+]
+
+def read_text_elements(stream, chunk_size=65536, encoding="utf-8"):
+    """Read raw text from a binary stream in bounded chunks, yielding the lines
+    of each chunk as text elements. Memory use stays around the chunk size no
+    matter how large the stream is.
+
+    Chunks are cut on the last newline, or on the last space if a line does
+    not fit in a chunk, so words are not split between chunks. A run of text
+    with neither that is longer than a chunk is cut wherever the chunk ends.
+    Lines may end in "\n" or "\r\n".
+
+    Parameters:
+        stream (file-like): binary stream to read from
+        chunk_size (int): (default=65536) number of bytes to read at a time
+        encoding (str): (default="utf-8") encoding of the stream, undecodable
+            bytes are replaced
+
+    Returns:
+        generator (list(str)): text elements for each chunk read
+    """
+
+    def decode(data):
+        # splitlines also drops the carriage return of crlf line endings
+        return data.decode(encoding, errors="replace").splitlines()
+
+    remainder = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+
+        data = remainder + chunk
+
+        cut = data.rfind(b"\n")
+        if cut == -1:
+            # a line is only cut once it no longer fits in a chunk, anything
+            # shorter waits for its newline or the end of the stream
+            if len(data) < chunk_size:
+                remainder = data
+                continue
+
+            cut = data.rfind(b" ")
+            if cut == -1:
+                cut = len(data) - 1
+
+        yield decode(data[:cut + 1])
+
+        remainder = data[cut + 1:]
+
+    if remainder:
+        yield decode(remainder)
@@ -2,12 +2,32 @@ import re
 
 from wordlist.filters import *
 
+def truncate_candidates(block, amount):
+    """Cut a block of newline terminated candidates down to at most a given
+    number of candidates
+
+    Parameters:
+        block (bytearray): newline terminated candidates
+        amount (int): most candidates to keep
+
+    Returns:
+        bytearray: the first candidates of the block
+    """
+    if block.count(b"\n") <= amount:
+        return block
+
+    end = -1
+    for _ in range(amount):
+        end = block.find(b"\n", end + 1)
+
+    return block[:end + 1]
+
 class WordListProcessor:
     """Processes given words and writes them to output controller
 
     Attributes:
         output_controller (OutputController): output controller for controling
-            of output
+            of output, may be None if only generate is used
         charset (str): (default=" _-+=.,;:") set of characters to use when 
             joining sets of words together
         max_combo_length (int): (default=5) max number of words to chain together
@@ -25,46 +45,96 @@ class WordListProcessor:
         self._min_word_len = min_word_length
         self._smush_words = smush_words
 
+        self._filters = [
+            FilterNoCaps(),
+            FilterNoNumbers(),
+            FilterOnlyEnglishLetters(),
+            FilterNoSymbols()
+        ]
+
+        self._chain_filter = FilterMakeWordChains()
+
+        self._filter_options = {
+            "charset" : self._charset,
+            "max_combo" : self._max_combo,
+            "min_length" : self._min_word_len,
+            "max_length" : self._max_word_len,
+            "smush_words" : self._smush_words
+        }
+
     def _filter_words(self, word_groups):
         def is_empty(string):
             return str.strip(string) == ""
 
     def process(self, word_groups):
         """Run the given set of word groups through a set of filters to create
-        passwords
+        passwords, writing them to the output controller
 
         Parameters:
             word_groups (list): list of strings to be turned into passwords
+
+        Returns:
+            int: number of candidates written
+        """
+        block = self.generate(word_groups)
+
+        if block:
+            self._output.write_bytes(block)
+
+        return block.count(b"\n")
+
+    @property
+    def output(self):
+        """OutputController: output controller candidates are written to"""
+        return self._output
+
+    def normalize(self, word_groups):
+        """Clean the given word groups of case, numbers and symbols, this does
+        not depend on any of the processor's settings so the result can be
+        shared between processors
+
+        Parameters:
+            word_groups (list): list of strings to be cleaned
+
+        Returns:
+            list (str): cleaned word groups, without empty groups
         """
 
         def is_empty(string):
             return str.strip(string) == ""
             #return string.replace()
         def remove_empty(groups):
-            return [ word for word in word_groups if not is_empty(word) ]
+            return [ word for word in groups if not is_empty(word) ]
 
         # remove empty words
         word_groups = remove_empty(word_groups)
 
-        filters = [
-            FilterNoCaps(),
-            FilterNoNumbers(),
-            FilterOnlyEnglishLetters(),
-            FilterNoSymbols(),
-            FilterMakeWordChains()
-        ]
-
-        for strain in filters:
-            word_groups = strain.filter_words(
-                word_groups, 
-                charset=self._charset, 
-                max_combo=self._max_combo,
-                min_length=self._min_word_len,
-                max_length=self._max_word_len,
-                smush_words=self._smush_words
-            )
+        for strain in self._filters:
+            word_groups = strain.filter_words(word_groups, **self._filter_options)
             word_groups = remove_empty(word_groups)
-        
-        for word in word_groups:
-            self._output.write("{}\n".format(word))
-        
+
+        return word_groups
+
+    def chain(self, word_groups):
+        """Create passwords from word groups already cleaned with normalize
+
+        Parameters:
+            word_groups (list): list of strings returned by normalize
+
+        Returns:
+            bytearray: newline terminated passwords
+        """
+        # chains are built directly as encoded bytes, ready to write as a block
+        return self._chain_filter.encode_chains(word_groups, **self._filter_options)
+
+    def generate(self, word_groups):
+        """Run the given set of word groups through a set of filters to create
+        passwords, without writing them anywhere
+
+        Parameters:
+            word_groups (list): list of strings to be turned into passwords
+
+        Returns:
+            bytearray: newline terminated passwords
+        """
+        return self.chain(self.normalize(word_groups))